@@ -17,7 +17,7 @@ def initialize_individual(individual_class, parameters):
     """
 
     genotype_length = np.random.randint(parameters.min_initial_len, parameters.max_initial_len)
-    return individual_class(np.random.randint(0, 255, genotype_length))
+    return individual_class(np.random.randint(0, 255, genotype_length).astype(np.uint8).tobytes())
 
 
 def parent_selection(population, parameters, toolbox):
@@ -160,4 +160,165 @@ def survival_selection(population, offspring, parameters, toolbox):
         best_ind_pop = tools.selBest(population, k=parameters.population_length // 2)
         best_ind_off = tools.selBest(offspring, k=parameters.population_length // 2)
 
-        return best_ind_pop + best_ind_off
\ No newline at end of file
+        return best_ind_pop + best_ind_off
+
+def pack_individuals(individuals):
+
+    """
+    Packs the codons of a group of individuals in a single array
+
+    :param individuals: individuals to pack
+
+    :return: codons (uint8 array), offsets (individual i is codons[offsets[i]:offsets[i+1]])
+    """
+
+    codons = np.frombuffer(b"".join(individuals), dtype=np.uint8).copy()
+    offsets = np.zeros(len(individuals) + 1, dtype=np.int64)
+    np.cumsum([len(individual) for individual in individuals], out=offsets[1:])
+
+    return codons, offsets
+
+
+def unpack_individuals(codons, offsets, individual_class):
+
+    """
+    Creates the individuals stored in a packed array of codons
+
+    :param codons: packed codons
+    :param offsets: offsets of each individual (see pack_individuals)
+    :param individual_class: class to which individuals belong to
+
+    :return: list of individuals
+    """
+
+    return [individual_class(codons[offsets[i]:offsets[i+1]].tobytes()) for i in range(len(offsets) - 1)]
+
+
+def gather_segments(codons, segment_starts, segment_lengths, segments_per_individual):
+
+    """
+    Builds a new packed array of codons concatenating segments of another one
+
+    :param codons: packed codons
+    :param segment_starts: first codon of each segment
+    :param segment_lengths: length of each segment
+    :param segments_per_individual: number of consecutive segments that form each new individual
+
+    :return: new codons, new offsets
+    """
+
+    segment_offsets = np.zeros(len(segment_lengths) + 1, dtype=np.int64)
+    np.cumsum(segment_lengths, out=segment_offsets[1:])
+
+    # Position of each new codon in the old array: start of its segment + position inside the segment
+    codon_idxs = np.arange(segment_offsets[-1]) + np.repeat(segment_starts - segment_offsets[:-1], segment_lengths)
+
+    return codons[codon_idxs], segment_offsets[::segments_per_individual]
+
+
+def batched_mating(codons, offsets, parameters):
+
+    """
+    Mating operator over a packed population (see mating). Parents are mated in consecutive pairs, and the mating
+    decisions and crossover points of every pair are drawn at once
+
+    :param codons: packed codons of the parents
+    :param offsets: offsets of the parents
+    :param parameters: parameters of the algorithm
+
+    :return: codons, offsets of the mated offspring
+    """
+
+    cross_number = (len(offsets) - 1) // 2
+
+    starts1 = offsets[0:2*cross_number:2]
+    starts2 = offsets[1:2*cross_number:2]
+    lengths1 = offsets[1:2*cross_number+1:2] - starts1
+    lengths2 = offsets[2:2*cross_number+2:2] - starts2
+
+    mated = np.random.random(cross_number) < parameters.mating_probability
+
+    # Pairs that are not mated are cut at their ends, so sons are copies of their parents
+    points1 = np.where(mated, np.random.randint(0, lengths1 - 1), lengths1)
+    points2 = np.where(mated, np.random.randint(0, lengths2 - 1), lengths2)
+
+    # son1 = parent1[:point1] + parent2[point2:], son2 = parent1[point1:] + parent2[:point2]
+    segment_starts = np.stack((starts1, starts2 + points2, starts1 + points1, starts2), axis=1).ravel()
+    segment_lengths = np.stack((points1, lengths2 - points2, lengths1 - points1, points2), axis=1).ravel()
+
+    return gather_segments(codons, segment_starts, segment_lengths, 2)
+
+
+def batched_mutation(codons, offsets, parameters):
+
+    """
+    Mutation operator over a packed population (see mutation). The mutation mask of every codon is drawn at once
+
+    :param codons: packed codons of the offspring
+    :param offsets: offsets of the offspring
+    :param parameters: parameters of the algorithm
+
+    :return: codons, offsets of the mutated offspring
+    """
+
+    mutated = np.random.random(len(codons)) < parameters.mutation_prob
+    codons[mutated] = np.random.randint(0, 256, np.count_nonzero(mutated))
+
+    return codons, offsets
+
+
+def batched_duplication(codons, offsets, parameters):
+
+    """
+    Duplication operator over a packed population (see duplication). The duplicated segments of every individual are
+    drawn at once
+
+    :param codons: packed codons of the offspring
+    :param offsets: offsets of the offspring
+    :param parameters: parameters of the algorithm
+
+    :return: codons, offsets of the duplicated offspring
+    """
+
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+
+    duplicated = np.random.random(len(lengths)) < parameters.duplication_probability
+    n_of_duplicated = np.count_nonzero(duplicated)
+
+    numbers_of_codons_to_duplicate = np.zeros(len(lengths), dtype=np.int64)
+    duplication_chain_starting_points = np.zeros(len(lengths), dtype=np.int64)
+
+    if n_of_duplicated > 0:
+        numbers_of_codons_to_duplicate[duplicated] = np.random.randint(
+            parameters.min_duplication_len, np.maximum(lengths[duplicated], parameters.max_duplication_len))
+        duplication_chain_starting_points[duplicated] = np.random.randint(0, lengths[duplicated] - 1)
+
+    # The duplicated chain can not go beyond the end of the individual
+    duplication_lengths = np.minimum(numbers_of_codons_to_duplicate, lengths - duplication_chain_starting_points)
+
+    segment_starts = np.stack((starts, starts + duplication_chain_starting_points), axis=1).ravel()
+    segment_lengths = np.stack((lengths, duplication_lengths), axis=1).ravel()
+
+    return gather_segments(codons, segment_starts, segment_lengths, 2)
+
+
+def batched_variation(parents, parameters, toolbox):
+
+    """
+    Applies mating, mutation and duplication to the whole offspring at once, keeping it packed in a single array of
+    codons between operators
+
+    :param parents: selected parents
+    :param parameters: parameters of the algorithm
+
+    :return: duplicated offspring
+    """
+
+    codons, offsets = pack_individuals(parents)
+
+    codons, offsets = batched_mating(codons, offsets, parameters)
+    codons, offsets = batched_mutation(codons, offsets, parameters)
+    codons, offsets = batched_duplication(codons, offsets, parameters)
+
+    return unpack_individuals(codons, offsets, creator.Individual)
@@ -2,12 +2,23 @@ import numpy as np
 from deap import base, creator, tools
 from parameters import Parameters
 from GA_operators import *
-from  GE_fitness import evaluate_individual
-from decode_backus_naur import decode_individual
+from GE_fitness import evaluate_individual, evaluate_individual_in_isolation, set_fitness, rescore_individuals, \
+    phenotype_errors
+from decode_backus_naur import decode_individual, get_grammar, get_terminal_operators
 import statistics
-import math
+import array
 from restrictions import manage_adaptative_restrictions
-from local_search import local_search
+from local_search import local_search_population
+from parallel_evaluation import PopulationExecutor, evaluate_individuals, evaluate_offspring_bounded
+from instrumentation import get_instrumentation
+from compiled_phenotypes import compiled_phenotypes
+from simplification import simplified_phenotypes
+from checkpoint import save_checkpoint, load_checkpoint
+from log_writer import open_log_writer
+import vectorized_evaluation
+import stack_machine
+import dual_numbers
+import expression_dag
 
 """
 File that contains operators corresponding to the GE (creation and launching)
@@ -28,7 +39,9 @@ def run_GE(parameters, verbose=True):
     toolbox = create_GA_classes(parameters)
     toolbox = setup_algorithm(parameters, toolbox)
 
-    return GA_algorithm(parameters, toolbox, verbose=verbose)
+    with PopulationExecutor(parameters) as executor:
+        toolbox.register("map", executor.map)
+        return GA_algorithm(parameters, toolbox, verbose=verbose)
 
 
 def create_GA_classes(parameters):
@@ -40,8 +53,7 @@ def create_GA_classes(parameters):
     :return:
     """
 
-    creator.create("Fitness", base.Fitness, weights=(-1.0,))
-    creator.create("Individual", list, fitness=creator.Fitness)
+    create_individual_classes()
 
     toolbox = base.Toolbox()
     toolbox.register("individual", initialize_individual, creator.Individual, parameters)
@@ -50,10 +62,54 @@ def create_GA_classes(parameters):
     return toolbox
 
 
+def create_individual_classes():
+
+    """
+    Creates the fitness and individual classes in the creator module of DEAP (if they do not exist yet). Individuals
+    are arrays of unsigned bytes, as codons take values between 0 and 255
+
+    :return:
+    """
+
+    if not hasattr(creator, "Individual"):
+        creator.create("Fitness", base.Fitness, weights=(-1.0,))
+        creator.create("Individual", array.array, typecode="B", fitness=creator.Fitness)
+
+
+def check_grammar(parameters):
+
+    """
+    Function that checks that the evaluation modes of the parameters support every operator and function of the
+    terminals of the grammar (the scalar evaluation mode supports any python expression)
+
+    :param parameters: parameters of the algorithm
+
+    :return:
+    """
+
+    evaluators = {"vectorized": vectorized_evaluation, "stack": stack_machine}
+    evaluators = {"evaluation mode " + parameters.evaluation_mode: evaluators.get(parameters.evaluation_mode)}
+
+    if parameters.derivative_mode == "dual":
+        evaluators["derivative mode dual"] = dual_numbers
+
+    if parameters.population_evaluation == "dag":
+        evaluators["population evaluation dag"] = expression_dag
+
+    operators = set().union(*(get_terminal_operators(terminal) for terminal in get_grammar(parameters).terminals))
+
+    for evaluation, evaluator in evaluators.items():
+        if evaluator is not None and not operators <= evaluator.SUPPORTED_OPERATORS:
+            raise ValueError('Invalid grammar for {}: unsupported operators {} in {} (supported ones: {})'.format(
+                evaluation, sorted(operators - evaluator.SUPPORTED_OPERATORS), parameters.grammar_file,
+                sorted(evaluator.SUPPORTED_OPERATORS)))
+
+
 def setup_algorithm(parameters, toolbox):
 
     """
-    Function that setups each operator of the GA
+    Function that setups each operator of the GA, checking first that the evaluation modes of the parameters can be
+    used (see Parameters.check_evaluation_modes and check_grammar)
 
     :param parameters: parmeters of the algorithm
     :param toolbox: toolbox of the algorithm
@@ -61,18 +117,48 @@ def setup_algorithm(parameters, toolbox):
     :return:
     """
 
+    parameters.check_evaluation_modes()
+    check_grammar(parameters)
+
     toolbox.register("select", parent_selection)
     toolbox.register("mate", mating)
     toolbox.register("mutate", mutation)
     toolbox.register("duplicate", duplication)
+    toolbox.register("vary", batched_variation)
     toolbox.register("survival_selection", survival_selection)
 
     toolbox.register("evaluate", evaluate_individual, parameters=parameters)
+    toolbox.register("evaluate_in_isolation", evaluate_individual_in_isolation)
 
     return toolbox
 
 
-def log_fitness_and_length(parameters, population, fitnesses, generation):
+def log_generation(parameters, population, fitnesses, generation, log_writer):
+
+    """
+    Logs the fitness, length and wrapping values of a generation, in the log lists of the parameters (if
+    parameters.keep_logs_in_memory) and in the log file (see log_writer.py)
+
+    :param parameters: parameters of the algorithm
+    :param population: current population
+    :param fitnesses: current fitness values
+    :param generation: current generation
+    :param log_writer: writer of the log file
+
+    :return: dictionary with the logged values (see log_writer.LOG_COLUMNS)
+    """
+
+    record = {"generation": generation}
+
+    log_fitness_and_length(parameters, population, fitnesses, generation, record)
+    log_wrapping(parameters, generation, record)
+
+    log_writer.write(record)
+
+    return record
+
+
+def log_fitness_and_length(parameters, population, fitnesses, generation, record):
 
     """
     Logs fitness and length parameters on each genration
@@ -81,6 +167,7 @@ def log_fitness_and_length(parameters, population, fitnesses, generation):
     :param population: current population
     :param fitnesses: current fitness values
     :param generation: current generation
+    :param record: dictionary where the logged values are added
 
     :return:
     """
@@ -91,26 +178,83 @@ def log_fitness_and_length(parameters, population, fitnesses, generation):
     min_fitness = min(fitnesses)
     sd_fitnesses = statistics.stdev(fitnesses)
 
-    parameters.avg_fitnesses[generation] = mean_fitness
-    parameters.min_fitnesses[generation] = min_fitness
-    parameters.sd_fitnesses[generation] = sd_fitnesses
-
     genotype_lengths = [len(ind) for ind in population]
     min_len = min(genotype_lengths)
     max_len = max(genotype_lengths)
     avg_len = sum(genotype_lengths) / len(genotype_lengths)
 
-    parameters.min_lens[generation] = min_len
-    parameters.max_lens[generation] = max_len
-    parameters.avg_lens[generation] = avg_len
+    record.update(avg_fitness=mean_fitness, min_fitness=min_fitness, std_fitness=sd_fitnesses,
+                  avg_genotype_len=avg_len, min_genotype_len=min_len, max_genotype_len=max_len)
+
+    if parameters.keep_logs_in_memory:
+        parameters.avg_fitnesses[generation] = mean_fitness
+        parameters.min_fitnesses[generation] = min_fitness
+        parameters.sd_fitnesses[generation] = sd_fitnesses
+
+        parameters.min_lens[generation] = min_len
+        parameters.max_lens[generation] = max_len
+        parameters.avg_lens[generation] = avg_len
+
 
+def count_generation_work(instrumentation, parameters, evaluated_individuals, n_of_evaluations):
 
-def log_wrapping(parameters, generation):
+    """
+    Adds the work done in the current generation to the counters of the instrumentation. Must be called before
+    log_wrapping, as wrappings are counted from the wrappings logged by each derivation. Decodes are counted by
+    decode_individual, so the derivations of get_non_terminal_indexes and of the neighbors of the local search (which
+    also log their wrappings) are not counted as decodes
+
+    :param instrumentation: instrumentation of the algorithm (see instrumentation.py)
+    :param parameters: parameters of the algorithm
+    :param evaluated_individuals: individuals evaluated in the generation
+    :param n_of_evaluations: number of evaluations of the generation (including local search)
+
+    :return:
+    """
+
+    n_of_decodes = parameters.n_of_decodes
+    parameters.n_of_decodes = 0
+
+    if not instrumentation.enabled:
+        return
+
+    invalid_individuals = [individual for individual in evaluated_individuals
+                           if individual.fitness.values[0] >= parameters.fitness_for_invalid_individuals]
+    partially_evaluated_individuals = [individual for individual in evaluated_individuals
+                                       if getattr(individual, "partially_evaluated", False)]
+
+    instrumentation.count("evaluations", n_of_evaluations)
+    instrumentation.count("invalid_individuals", len(invalid_individuals))
+    instrumentation.count("partial_evaluations", len(partially_evaluated_individuals))
+    instrumentation.count("decodes", n_of_decodes)
+    instrumentation.count("wrappings", sum(parameters.wrappings_by_individual))
+
+
+def create_instrumentation(parameters):
+
+    """
+    Creates the instrumentation selected by parameters.instrumentation, watching the caches of the evaluation
+
+    :param parameters: parameters of the algorithm
+
+    :return: instrumentation (see instrumentation.py)
+    """
+
+    instrumentation = get_instrumentation(parameters)
+    instrumentation.watch_cache("fitness_cache", phenotype_errors)
+    instrumentation.watch_cache("compiled_phenotypes_cache", compiled_phenotypes)
+    instrumentation.watch_cache("simplified_phenotypes_cache", simplified_phenotypes)
+
+    return instrumentation
+
+
+def log_wrapping(parameters, generation, record):
     """
     Logs current wrapping values
 
     :param parameters: algorithm parameters
     :param generation: current generation
+    :param record: dictionary where the logged values are added
 
     :return:
     """
@@ -118,12 +262,41 @@ def log_wrapping(parameters, generation):
     mean_wrapping = sum(parameters.wrappings_by_individual) / len(parameters.wrappings_by_individual)
     std_wrapping = statistics.stdev(parameters.wrappings_by_individual)
 
-    parameters.avg_wrapping[generation] = mean_wrapping
-    parameters.sd_wrapping[generation] = std_wrapping
+    record.update(avg_wrapping=mean_wrapping, std_wrapping=std_wrapping)
+
+    if parameters.keep_logs_in_memory:
+        parameters.avg_wrapping[generation] = mean_wrapping
+        parameters.sd_wrapping[generation] = std_wrapping
 
     parameters.wrappings_by_individual = []
 
 
+class GAState:
+
+    """
+    State of a run of the GA between two generations
+    """
+
+    def __init__(self, population, generation, number_of_evaluations, success):
+
+        """
+        Creates the state of a run
+
+        :param population: current population (already evaluated)
+        :param generation: current generation
+        :param number_of_evaluations: number of evaluations done
+        :param success: whether the run has finished successfully
+        """
+
+        self.population = population
+        self.generation = generation
+        self.number_of_evaluations = number_of_evaluations
+        self.success = success
+
+        # Fitness values of the population with the current lambdas
+        self.fitnesses_list = [individual.fitness.values[0] for individual in population]
+
+
 def GA_algorithm(parameters, toolbox, verbose=True):
 
     """
@@ -136,6 +309,61 @@ def GA_algorithm(parameters, toolbox, verbose=True):
     :return: results of the executions
     """
 
+    parameters.generation_statistics = []
+    instrumentation = create_instrumentation(parameters)
+
+    parameters.log_file_position = None
+    log_writer = open_log_writer(parameters)
+
+    state = initialize_GA(parameters, toolbox, instrumentation, log_writer, verbose=verbose)
+
+    return GA_loop(state, parameters, toolbox, instrumentation, log_writer, verbose=verbose)
+
+
+def resume_GE(checkpoint_file, verbose=True):
+
+    """
+    Resumes a run of the GE from a checkpoint file (see checkpoint.py), giving the same result as if it had not been
+    stopped
+
+    :param checkpoint_file: path of the checkpoint file
+    :param verbose: whether to print logs
+
+    :return: execution of GA_loop (see below)
+    """
+
+    create_individual_classes()
+
+    population, generation, number_of_evaluations, success, parameters = load_checkpoint(checkpoint_file,
+                                                                                         creator.Individual)
+    state = GAState(population, generation, number_of_evaluations, success)
+
+    toolbox = create_GA_classes(parameters)
+    toolbox = setup_algorithm(parameters, toolbox)
+
+    if verbose:
+        print(f"Resuming from generation {state.generation}")
+
+    with PopulationExecutor(parameters) as executor:
+        toolbox.register("map", executor.map)
+        return GA_loop(state, parameters, toolbox, create_instrumentation(parameters), open_log_writer(parameters),
+                       verbose=verbose)
+
+
+def initialize_GA(parameters, toolbox, instrumentation, log_writer, verbose=True):
+
+    """
+    Creates and evaluates the initial population
+
+    :param parameters: parameters of the algorithm
+    :param toolbox: toolbox of the algorithm
+    :param instrumentation: instrumentation of the algorithm (see instrumentation.py)
+    :param log_writer: writer of the log file (see log_writer.py)
+    :param verbose: whether to print logs
+
+    :return: state of the run (see GAState)
+    """
+
     # Initialization of the population
     parameters.clear_logs()
     population = toolbox.population(parameters.population_length)
@@ -143,108 +371,173 @@ def GA_algorithm(parameters, toolbox, verbose=True):
     number_of_evaluations = 0
 
     # Evaluation
-    fitnesses = [toolbox.evaluate(individual) for individual in population]
-    fitnesses_list = []
-    for individual, fitness in zip(population, fitnesses):
-        if math.isnan(fitness[0]):
-            fitness = (parameters.fitness_for_invalid_individuals, False)
-        individual.fitness.values = fitness
-        fitnesses_list.append(fitness[0])
-        number_of_evaluations += 1
+    with instrumentation.phase("evaluate"):
+        fitnesses = evaluate_individuals(population, parameters, toolbox)
+        for individual, fitness in zip(population, fitnesses):
+            set_fitness(individual, fitness, parameters)
+            number_of_evaluations += 1
 
-    success = False
+    state = GAState(population, 0, number_of_evaluations, False)
 
-    generation = 0
+    count_generation_work(instrumentation, parameters, population, number_of_evaluations)
+    instrumentation.end_generation(state.generation)
 
-    log_fitness_and_length(parameters, population, fitnesses_list, generation)
-    log_wrapping(parameters, generation)
+    record = log_generation(parameters, population, state.fitnesses_list, state.generation, log_writer)
 
     if verbose:
         print("generation\tmin fitness\tavg fitness\tstd fitness")
         print("-------------------------------------------------------------")
-        print(f"{generation}\t{parameters.min_fitnesses[generation]}\t{parameters.avg_fitnesses[generation]}\t{parameters.sd_fitnesses[generation]}")
+        print(f"{state.generation}\t{record['min_fitness']}\t{record['avg_fitness']}\t{record['std_fitness']}")
+
+    return state
 
-    while generation < parameters.max_gens:
 
-        generation += 1
-        parameters.compute_mutation_prob(generation)
-        parameters.compute_tournament_size(generation)
+def GA_loop(state, parameters, toolbox, instrumentation, log_writer, verbose=True):
 
-        # Selection
+    """
+    Runs generations of the GA until the maximum number of generations or a successful individual is reached, storing
+    a checkpoint every parameters.checkpoint_interval generations if parameters.checkpoint_file is set. The log file
+    is closed at the end (also if the run is interrupted), so it contains every generation run
+
+    :param state: state of the run (see GAState)
+    :param parameters: parameters of the algorithm
+    :param toolbox: toolbox of the algorithm
+    :param instrumentation: instrumentation of the algorithm (see instrumentation.py)
+    :param log_writer: writer of the log file (see log_writer.py)
+    :param verbose: whether to print logs
+
+    :return: results of the executions
+    """
+
+    try:
+        while state.generation < parameters.max_gens and not state.success:
+
+            GA_step(state, parameters, toolbox, instrumentation, log_writer, verbose=verbose)
+
+            if parameters.checkpoint_file is not None and state.generation % parameters.checkpoint_interval == 0:
+                parameters.log_file_position = log_writer.tell()
+                parameters.generation_statistics = instrumentation.records
+                save_checkpoint(parameters.checkpoint_file, state.population, state.generation,
+                                state.number_of_evaluations, state.success, parameters)
+
+    finally:
+        log_writer.close()
+
+    if instrumentation.enabled and parameters.instrumentation_file is not None:
+        instrumentation.export(parameters.instrumentation_file)
+    parameters.generation_statistics = instrumentation.records
+
+    # Prints info of the best individual
+    best_individual = state.population[np.argmin(state.fitnesses_list)]
+    print(f"Best individual: {decode_individual(best_individual, parameters)[0]}, fitness value: {best_individual.fitness.values[0]}")
+
+    return parameters, state.success, best_individual.fitness.values[0], state.number_of_evaluations
+
+
+def GA_step(state, parameters, toolbox, instrumentation, log_writer, verbose=True):
+
+    """
+    Runs a generation of the GA, updating the state of the run
+
+    :param state: state of the run (see GAState)
+    :param parameters: parameters of the algorithm
+    :param toolbox: toolbox of the algorithm
+    :param instrumentation: instrumentation of the algorithm (see instrumentation.py)
+    :param log_writer: writer of the log file (see log_writer.py)
+    :param verbose: whether to print logs
+
+    :return:
+    """
+
+    population = state.population
+    number_of_evaluations = state.number_of_evaluations
+
+    state.generation += 1
+    generation = state.generation
+    parameters.compute_mutation_prob(generation)
+    parameters.compute_tournament_size(generation)
+
+    # Selection
+    with instrumentation.phase("select"):
         parents = toolbox.select(population, parameters, toolbox)
 
+    if parameters.variation_mode == "batched":
+
+        # Mating, mutation and duplication over the packed offspring
+        with instrumentation.phase("vary"):
+            duplicated_offspring = toolbox.vary(parents, parameters, toolbox)
+
+    else:
+
         # Mating
-        offspring = toolbox.mate(parameters, parents, toolbox)
+        with instrumentation.phase("mate"):
+            offspring = toolbox.mate(parameters, parents, toolbox)
 
         # Mutation
-        mutated_offspring = toolbox.mutate(offspring, parameters)
+        with instrumentation.phase("mutate"):
+            mutated_offspring = toolbox.mutate(offspring, parameters)
 
         # Duplication
-        duplicated_offspring = toolbox.duplicate(mutated_offspring, parameters, toolbox)
-
-        # Evaluation
-        offspring_fitnesses = [toolbox.evaluate(individual) for individual in duplicated_offspring]
+        with instrumentation.phase("duplicate"):
+            duplicated_offspring = toolbox.duplicate(mutated_offspring, parameters, toolbox)
+
+    # Evaluation (local search needs the exact fitness values of the offspring). Bounding only pays off when the
+    # sample points are evaluated one by one (scalar mode): the other modes evaluate the whole grid at once
+    with instrumentation.phase("evaluate"):
+        if (parameters.bounded_evaluation and generation % 10 != 0 and parameters.evaluation_mode == "scalar"
+                and parameters.derivative_mode == "finite_differences"):
+            offspring_fitnesses = evaluate_offspring_bounded(duplicated_offspring, population, parameters)
+        else:
+            offspring_fitnesses = evaluate_individuals(duplicated_offspring, parameters, toolbox)
         offspring_fitnesses_list = []
         for ind, fit in zip(duplicated_offspring, offspring_fitnesses):
-            if math.isnan(fit[0]):
-                fit = parameters.fitness_for_invalid_individuals, False
-            ind.fitness.values = fit
-            offspring_fitnesses_list.append(fit[0])
+            offspring_fitnesses_list.append(set_fitness(ind, fit, parameters))
             number_of_evaluations += 1
 
-        # Local search
-        if generation % 10 == 0:
-            for idx, ind in enumerate(duplicated_offspring):
-                duplicated_offspring[idx], evaluations = local_search(ind, parameters, toolbox)
-                number_of_evaluations += evaluations
+    # Local search
+    if generation % 10 == 0:
+        with instrumentation.phase("local_search"):
+            duplicated_offspring, evaluations = local_search_population(duplicated_offspring, parameters, toolbox)
+            number_of_evaluations += evaluations
 
-        # Survival selection
+    # Survival selection
+    with instrumentation.phase("survival"):
         population = survival_selection(population, duplicated_offspring, parameters, toolbox)
 
-        assert len(population) == parameters.population_length
+    assert len(population) == parameters.population_length
 
-        fitnesses = [toolbox.evaluate(individual) for individual in population]
-        fitnesses_list = [ind.fitness.values[0] for ind in population]
+    # Survivors keep the fitness value, feasibility and components computed when they were evaluated
+    fitnesses_list = [ind.fitness.values[0] for ind in population]
 
-        best_individual_idx = np.argmin(fitnesses_list)
-        best_individual = population[best_individual_idx]
-        best_individuals_fitness_value = fitnesses[best_individual_idx]
+    best_individual_idx = np.argmin(fitnesses_list)
+    best_individual = population[best_individual_idx]
 
-        # For restrictions
-        if best_individuals_fitness_value[1]:
-            parameters.best_individual_factible_integrationConst += 1
+    # For restrictions
+    if best_individual.integration_constant_feasible:
+        parameters.best_individual_factible_integrationConst += 1
 
-        if len(best_individual) <= parameters.max_genotype_len:
-            parameters.best_individual_factible_times_populationLen += 1
+    if len(best_individual) <= parameters.max_genotype_len:
+        parameters.best_individual_factible_times_populationLen += 1
 
+    with instrumentation.phase("restrictions"):
         recalculate = False
         if generation % parameters.Nf == 0:
             recalculate = manage_adaptative_restrictions(parameters)
 
+        # The fitness values are recombined from the stored components with the new lambdas
         if recalculate:
-            fitnesses_list = []
-            fitnesses = [toolbox.evaluate(individual) for individual in population]
-            for individual, fitness in zip(population, fitnesses):
-                if math.isnan(fitness[0]):
-                    fitness = (parameters.fitness_for_invalid_individuals, False)
-                individual.fitness.values = fitness
-                fitnesses_list.append(fitness[0])
-                number_of_evaluations += 1
-
-        log_fitness_and_length(parameters, population, fitnesses_list, generation)
-        log_wrapping(parameters, generation)
+            fitnesses_list = rescore_individuals(population, parameters)
 
-        if verbose:
-            print(
-                f"{generation}\t{parameters.min_fitnesses[generation]}\t{parameters.avg_fitnesses[generation]}\t{parameters.sd_fitnesses[generation]}")
+    count_generation_work(instrumentation, parameters, duplicated_offspring,
+                          number_of_evaluations - state.number_of_evaluations)
+    instrumentation.end_generation(generation)
 
-        if min(fitnesses_list) <= parameters.min_assumable_fitness:
-            success = True
-            break
+    record = log_generation(parameters, population, fitnesses_list, generation, log_writer)
 
+    if verbose:
+        print(f"{generation}\t{record['min_fitness']}\t{record['avg_fitness']}\t{record['std_fitness']}")
 
-    # Prints info of the best individual
-    best_individual = population[np.argmin(fitnesses_list)]
-    print(f"Best individual: {decode_individual(best_individual, parameters)[0]}, fitness value: {best_individual.fitness.values[0]}")
-
-    return parameters, success, best_individual.fitness.values[0], number_of_evaluations
+    state.population = population
+    state.fitnesses_list = fitnesses_list
+    state.number_of_evaluations = number_of_evaluations
+    state.success = min(fitnesses_list) <= parameters.min_assumable_fitness
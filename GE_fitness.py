@@ -1,11 +1,21 @@
 import numpy as np
 from decode_backus_naur import decode_individual
+from vectorized_evaluation import evaluate_on_samples, get_invalid_mask
+from compiled_phenotypes import get_compiled_phenotype
+from dual_numbers import evaluate_with_derivative
+from caching import LRUCache
+from problems import get_target_samples, add_problem_cache
 import math
+import copy
 
 """
 File that contain all corresponding to the fitness value calculation
 """
 
+phenotype_errors = LRUCache(max_size=10000)
+add_problem_cache(phenotype_errors)
+
+
 def evaluate_individual(individual, parameters):
 
     """
@@ -14,27 +24,400 @@ def evaluate_individual(individual, parameters):
     :param individual: individual to evaluate
     :param parameters: paraemters of the algorithm
 
+    :return: (fitness_value, True if satisfies the integration constant condition; False otherwise,
+              fitness components (see get_fitness_value))
+    """
+
+    # Decodes the mathematical expression corresponding to the individual
+    decoded_function, correctly_decoded = decode_individual(individual, parameters)
+
+    if not correctly_decoded:
+        return get_fitness_value(individual, (None, None), parameters)
+
+    return get_fitness_value(individual, get_phenotype_error(decoded_function, parameters), parameters)
+
+
+def get_fitness_value(individual, phenotype_error, parameters):
+
+    """
+    Adds the penalties of the restrictions to the approximation error of the individual's expression
+
+    :param individual: individual to evaluate
+    :param phenotype_error: (approximation error, |F^(0) - F_0|) of the decoded expression (see get_phenotype_error)
+    :param parameters: parameters of the algorithm
+
+    :return: (fitness_value, True if satisfies the integration constant condition; False otherwise,
+              fitness components: (approximation error (None if not valid), genotype length excess gx,
+              deviation from the integration constant hx))
+    """
+
+    fitness_val, hx = phenotype_error
+    fitness_components = (fitness_val, get_genotype_len_excess(individual, parameters), hx)
+
+    return combine_fitness_components(fitness_components, parameters) + (fitness_components,)
+
+
+def combine_fitness_components(fitness_components, parameters):
+
+    """
+    Computes the fitness value from its components with the current lambdas of the restrictions
+
+    :param fitness_components: fitness components (see get_fitness_value)
+    :param parameters: parameters of the algorithm
+
     :return: (fitness_value, True if satisfies the integration constant condition; False otherwise)
     """
 
-    deltaX = (parameters.interval[1] - parameters.interval[0]) / parameters.N
+    fitness_val, gx, hx = fitness_components
 
-    sum = 0
+    if fitness_val is None:
+        return parameters.fitness_for_invalid_individuals, False
+
+    genotype_len_penalty = get_genotype_len_penalty(gx, parameters)
+    integration_constant_penalty = get_integration_constant_penalty(hx, parameters)
+
+    return (fitness_val + genotype_len_penalty + integration_constant_penalty,
+            integration_constant_penalty == 0)
+
+
+def set_fitness(individual, fitness, parameters):
+
+    """
+    Stores the result of the evaluation of an individual: its fitness value, whether it satisfies the integration
+    constant condition and its fitness components
+
+    :param individual: evaluated individual
+    :param fitness: result of the evaluation (see evaluate_individual and evaluate_individual_bounded)
+    :param parameters: parameters of the algorithm
+
+    :return: fitness value
+    """
+
+    fitness_value, integration_constant_feasible, fitness_components = fitness[:3]
+
+    if math.isnan(fitness_value):
+        fitness_value, integration_constant_feasible = parameters.fitness_for_invalid_individuals, False
+
+    individual.fitness.values = fitness_value,
+    individual.integration_constant_feasible = integration_constant_feasible
+    individual.fitness_components = fitness_components
+    individual.partially_evaluated = len(fitness) > 3 and fitness[3]
+
+    return fitness_value
+
+
+def rescore_individuals(individuals, parameters):
+
+    """
+    Recomputes the fitness values of already evaluated individuals with the current lambdas of the restrictions,
+    combining their stored fitness components (see set_fitness) at once for the whole group. No expression is decoded
+    nor evaluated
+
+    :param individuals: evaluated individuals
+    :param parameters: parameters of the algorithm
+
+    :return: list of fitness values
+    """
+
+    fitness_components = np.array([individual.fitness_components for individual in individuals], dtype=float)
+    fitness_val, gx, hx = fitness_components.T
+
+    invalid = np.isnan(fitness_val)
+
+    genotype_len_penalty = np.minimum(parameters.lambda_genotype_len * gx, parameters.fitness_for_invalid_individuals)
+    integration_constant_penalty = np.minimum(
+        parameters.lambda_integration_const * np.maximum(0, hx - parameters.epsilon_integration_constant_tol),
+        parameters.fitness_for_invalid_individuals)
+
+    fitness_values = np.where(invalid, parameters.fitness_for_invalid_individuals,
+                              fitness_val + genotype_len_penalty + integration_constant_penalty)
+    integration_constant_feasible = ~invalid & (integration_constant_penalty == 0)
+
+    for individual, fitness_value, feasible in zip(individuals, fitness_values.tolist(),
+                                                   integration_constant_feasible.tolist()):
+        individual.fitness.values = fitness_value,
+        individual.integration_constant_feasible = feasible
+
+    return fitness_values.tolist()
+
+
+def evaluate_individual_in_isolation(individual, parameters):
+
+    """
+    Evaluates an individual without modifying parameters, so it can be run in another thread or process
+
+    :param individual: individual to evaluate
+    :param parameters: parameters of the algorithm
+
+    :return: (fitness value (see evaluate_individual), wrappings logged while decoding the individual, number of
+             decodes)
+    """
+
+    parameters = copy.copy(parameters)
+    parameters.wrappings_by_individual = []
+    parameters.n_of_decodes = 0
+
+    return evaluate_individual(individual, parameters), parameters.wrappings_by_individual, parameters.n_of_decodes
+
+
+def evaluate_individual_bounded(individual, parameters, cutoff):
+
+    """
+    Evaluates an individual stopping as soon as its fitness value is known to be greater than cutoff (so it can not
+    survive). The penalties of the restrictions are computed first, and then the weighted error is accumulated over
+    blocks of parameters.evaluation_block_size sample points
+
+    :param individual: individual to evaluate
+    :param parameters: parameters of the algorithm
+    :param cutoff: fitness value above which the exact value is not needed
+
+    :return: (fitness_value, True if satisfies the integration constant condition; False otherwise,
+              fitness components (see get_fitness_value), True if the evaluation was aborted, so the fitness value
+              and the approximation error are lower bounds)
+    """
 
-    # Decodes the mathematical expression corresponding to the individual
     decoded_function, correctly_decoded = decode_individual(individual, parameters)
 
     if not correctly_decoded:
-        return parameters.fitness_for_invalid_individuals, False
+        return get_fitness_value(individual, (None, None), parameters) + (False,)
+
+    phenotype_error, partial = get_phenotype_error_bounded(individual, decoded_function, parameters, cutoff)
+    fitness_value, integration_constant_feasible, fitness_components = get_fitness_value(individual, phenotype_error,
+                                                                                         parameters)
+
+    if partial:
+        fitness_value = min(fitness_value, parameters.fitness_for_invalid_individuals)
+
+    return fitness_value, integration_constant_feasible, fitness_components, partial
+
+
+def get_phenotype_error_bounded(individual, decoded_function, parameters, cutoff):
+
+    """
+    Returns the approximation error of a decoded expression and its deviation from the integration constant, stopping
+    the accumulation of the error as soon as the fitness value of the individual is known to be greater than cutoff.
+    Only complete results are stored in the cache of approximation errors
+
+    :param individual: individual to evaluate
+    :param decoded_function: decoded expression of the individual
+    :param parameters: parameters of the algorithm
+    :param cutoff: fitness value above which the exact value is not needed
+
+    :return: ((approximation error, |F^(0) - F_0|) (see get_phenotype_error), True if the evaluation was aborted, so
+             the approximation error is a lower bound)
+    """
+
+    key = get_phenotype_error_key(decoded_function, parameters, parameters.evaluation_mode)
+    phenotype_error = phenotype_errors.get(key)
+
+    if phenotype_error is not None:
+        return phenotype_error, False
+
+    hx = get_integration_constant_deviation(decoded_function, parameters)
+
+    if hx is None or not math.isfinite(hx):
+        return get_phenotype_error(decoded_function, parameters), False
+
+    max_error = (cutoff - get_genotype_len_penalty(get_genotype_len_excess(individual, parameters), parameters)
+                 - get_integration_constant_penalty(hx, parameters))
+
+    samples = get_target_samples(parameters)
+
+    sum = 0
+    block_sums = []
+
+    for start in range(0, parameters.N + 1, parameters.evaluation_block_size):
+
+        if sum / (parameters.N + 1) > max_error:
+            return (sum / (parameters.N + 1), hx), True
+
+        end = start + parameters.evaluation_block_size
+        contributions = get_weighted_error_contributions(samples.x[start:end], samples.fx[start:end], decoded_function,
+                                                         parameters)
+
+        if contributions is None:
+            phenotype_error = None, None
+            break
+
+        if isinstance(contributions, list):
+            for contribution in contributions:
+                sum += contribution
+        else:
+            sum += float(np.sum(contributions))
+            block_sums.append(contributions)
+
+        # Terms are not negative, so the error of the whole grid will also be too high
+        if sum > parameters.fitness_for_invalid_individuals:
+            phenotype_error = None, None
+            break
+
+    else:
+        # The error of the whole grid is summed as in get_phenotype_error, so the result does not depend on the blocks
+        if block_sums:
+            sum = float(np.sum(np.concatenate(block_sums)))
+
+        if math.isnan(sum) or sum > parameters.fitness_for_invalid_individuals:
+            phenotype_error = None, None
+        else:
+            phenotype_error = sum / (parameters.N + 1), hx
+
+    phenotype_errors.max_size = parameters.fitness_cache_size
+    phenotype_errors.put(key, phenotype_error)
+
+    return phenotype_error, False
+
+
+def get_phenotype_error(decoded_function, parameters):
+
+    """
+    Returns the approximation error of a decoded expression and its deviation from the integration constant. Both
+    only depend on the expression (not on the genotype nor on the lambdas of the restrictions), so they are stored in
+    a LRU cache keyed by the expression
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: (approximation error, |F^(0) - F_0|); (None, None) if the expression is not valid
+    """
+
+    key = get_phenotype_error_key(decoded_function, parameters, parameters.evaluation_mode)
+    phenotype_error = phenotype_errors.get(key)
+
+    if phenotype_error is None:
+        phenotype_error = compute_phenotype_error(decoded_function, parameters)
+
+        phenotype_errors.max_size = parameters.fitness_cache_size
+        phenotype_errors.put(key, phenotype_error)
+
+    return phenotype_error
+
+
+def get_phenotype_error_key(decoded_function, parameters, evaluation_mode):
+
+    """
+    Returns the key of a decoded expression in the cache of approximation errors
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+    :param evaluation_mode: way in which the error is computed
+
+    :return: key
+    """
+
+    return (decoded_function, parameters.problem, parameters.N, parameters.h, parameters.U, parameters.K0,
+            parameters.K1, evaluation_mode, parameters.derivative_mode)
+
+
+def compute_phenotype_error(decoded_function, parameters):
+
+    """
+    Computes the approximation error of a decoded expression and its deviation from the integration constant
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: (approximation error, |F^(0) - F_0|); (None, None) if the expression is not valid
+    """
+
+    if parameters.derivative_mode == "dual":
+        return compute_phenotype_error_dual(decoded_function, parameters)
+
+    if parameters.evaluation_mode == "stack":
+        return compute_phenotype_error_stack(decoded_function, parameters)
+
+    if parameters.evaluation_mode == "vectorized":
+        sum, correctly_evaluated = get_weighted_error_vectorized(decoded_function, parameters)
+    else:
+        sum, correctly_evaluated = get_weighted_error(decoded_function, parameters)
+
+    if not correctly_evaluated:
+        return None, None
+
+    if math.isnan(sum) or sum > parameters.fitness_for_invalid_individuals:
+        return None, None
+
+    hx = get_integration_constant_deviation(decoded_function, parameters)
+
+    if hx is None:
+        return None, None
+
+    return sum / (parameters.N + 1), hx
+
+
+def compute_phenotype_error_dual(decoded_function, parameters):
+
+    """
+    Computes the approximation error of a decoded expression and its deviation from the integration constant with a
+    single evaluation over dual numbers (the sample grid and x=0)
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: (approximation error, |F^(0) - F_0|); (None, None) if the expression is not valid
+    """
+
+    x = np.append(get_sample_points(parameters), 0.0)
+    sum, correctly_evaluated, Fhat = get_weighted_error_vectorized_dual(x, decoded_function, parameters)
+
+    if not correctly_evaluated:
+        return None, None
+
+    if math.isnan(sum) or sum > parameters.fitness_for_invalid_individuals:
+        return None, None
+
+    return sum / (parameters.N + 1), abs(float(Fhat[-1]) - parameters.F_0)
+
+
+def compute_phenotype_error_stack(decoded_function, parameters):
+
+    """
+    Computes the approximation error of a decoded expression and its deviation from the integration constant running
+    its postfix program (see stack_machine.py) once over the sample grid, the x+h grid and x=0. F^(0) is computed with
+    NumPy, so it can differ in the last bits from the one of get_integration_constant_deviation
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: (approximation error, |F^(0) - F_0|); (None, None) if the expression is not valid
+    """
+
+    x = get_sample_points(parameters)
+    n_of_points = len(x)
+
+    program = get_compiled_phenotype(decoded_function, parameters, kind="stack")
+    Fhat = evaluate_on_samples(program, np.concatenate((x, x + parameters.h, [0.0])))
+
+    sum, correctly_evaluated = get_weighted_error_from_samples(Fhat[:n_of_points], Fhat[n_of_points:-1], parameters)
+
+    if (not correctly_evaluated or math.isnan(sum) or sum > parameters.fitness_for_invalid_individuals
+            or not np.isfinite(Fhat[-1])):
+        return None, None
 
-    for i in range(parameters.N+1):
+    return sum / (parameters.N + 1), abs(float(Fhat[-1]) - parameters.F_0)
+
+
+def get_weighted_error(decoded_function, parameters):
+
+    """
+    Computes the weighted sum of the absolute differences between the function to integrate and the derivative of the
+    decoded expression, evaluating it point by point
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: (weighted error, False if the decoded expression could not be evaluated in some point)
+    """
+
+    samples = get_target_samples(parameters)
+
+    sum = 0
+
+    for x, fx in zip(samples.x.tolist(), samples.fx.tolist()):
 
-        x = parameters.interval[0] + i * deltaX
-        fx = get_value_function_to_integrate(x, parameters)
         Fhat_derived_x, division_by_zero = get_value_decoded_function(x, decoded_function, parameters)
 
         if division_by_zero:
-            return parameters.fitness_for_invalid_individuals, False
+            return sum, False
 
         omegai = parameters.K1
         absolute_difference = abs(Fhat_derived_x - fx)
@@ -43,41 +426,160 @@ def evaluate_individual(individual, parameters):
 
         sum += omegai * absolute_difference
 
-    if sum > parameters.fitness_for_invalid_individuals:
-        return parameters.fitness_for_invalid_individuals, False
+    return sum, True
 
-    fitness_val = (sum / (parameters.N + 1))
 
-    genotype_len_penalty = get_genotype_len_penalty(individual, parameters)
-    integration_constant_penalty = get_integration_constant_penalty(decoded_function, parameters)
+def get_weighted_error_vectorized(decoded_function, parameters):
 
-    return (fitness_val + genotype_len_penalty + integration_constant_penalty,
-            integration_constant_penalty == 0)
+    """
+    Computes the same weighted error as get_weighted_error, but evaluating the decoded expression over the whole sample
+    grid (and the x+h grid) at once with NumPy
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: (weighted error, False if the decoded expression could not be evaluated in some point)
+    """
+
+    x = get_sample_points(parameters)
+    function = get_compiled_phenotype(decoded_function, parameters, kind="vectorized")
 
+    Fhat_x = evaluate_on_samples(function, x)
+    Fhat_x_plus_h = evaluate_on_samples(function, x + parameters.h)
 
-def get_value_function_to_integrate(x, parameters):
+    return get_weighted_error_from_samples(Fhat_x, Fhat_x_plus_h, parameters)
+
+
+def get_weighted_error_from_samples(Fhat_x, Fhat_x_plus_h, parameters):
 
     """
-    Function that computes the value of the function to integrate in the point x
+    Computes the weighted error from the values of the decoded expression over the sample grid and the x+h grid
 
-    :param x: point
+    :param Fhat_x: values of the decoded expression in x
+    :param Fhat_x_plus_h: values of the decoded expression in x+h
     :param parameters: parameters of the algorithm
 
-    :return: f(x)
+    :return: (weighted error, False if the decoded expression could not be evaluated in some point)
+    """
+
+    if np.any(get_invalid_mask(Fhat_x)) or np.any(get_invalid_mask(Fhat_x_plus_h)):
+        return 0, False
+
+    with np.errstate(all="ignore"):
+        Fhat_derived_x = (Fhat_x_plus_h - Fhat_x) / parameters.h
+
+    return get_weighted_error_from_derivative(Fhat_derived_x, parameters)
+
+
+def get_weighted_error_vectorized_dual(x, decoded_function, parameters):
+
     """
+    Computes the weighted error using the exact derivative of the decoded expression, obtained evaluating it over dual
+    numbers. The value in x=0 (for the integration constant) is obtained in the same evaluation if x contains it
+
+    :param x: points where the decoded expression is evaluated (the sample points go first)
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: (weighted error, False if the decoded expression could not be evaluated in some point, values of the
+             decoded expression in x)
+    """
+
+    function = get_compiled_phenotype(decoded_function, parameters, kind="dual")
+    Fhat, Fhat_derived = evaluate_with_derivative(function, x)
+
+    if np.any(get_invalid_mask(Fhat)) or np.any(get_invalid_mask(Fhat_derived)):
+        return 0, False, Fhat
+
+    sum, correctly_evaluated = get_weighted_error_from_derivative(Fhat_derived[:parameters.N + 1], parameters)
+
+    return sum, correctly_evaluated, Fhat
+
+
+def get_weighted_error_contributions(x, fx, decoded_function, parameters):
+
+    """
+    Computes the terms of the weighted error corresponding to some sample points, in the way selected by
+    parameters.evaluation_mode and parameters.derivative_mode
+
+    :param x: sample points
+    :param fx: values of the function to integrate in x
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: weighted absolute difference on each sample point (a list in scalar mode, so it can be summed point by
+             point); None if the decoded expression could not be evaluated in some point
+    """
+
+    if parameters.derivative_mode == "dual":
+        function = get_compiled_phenotype(decoded_function, parameters, kind="dual")
+        Fhat_x, Fhat_derived_x = evaluate_with_derivative(function, x)
+
+        if np.any(get_invalid_mask(Fhat_x)) or np.any(get_invalid_mask(Fhat_derived_x)):
+            return None
+
+    elif parameters.evaluation_mode in ("vectorized", "stack"):
+        # The block and the block shifted by h are evaluated at once
+        function = get_compiled_phenotype(decoded_function, parameters, kind=parameters.evaluation_mode)
+        Fhat = evaluate_on_samples(function, np.concatenate((x, x + parameters.h)))
+
+        if np.any(get_invalid_mask(Fhat)):
+            return None
+
+        with np.errstate(all="ignore"):
+            Fhat_derived_x = (Fhat[len(x):] - Fhat[:len(x)]) / parameters.h
 
-    if parameters.problem == 1:
-        return 6 * x**2
-    elif parameters.problem == 2:
-        return 2 / ((x + 1) ** 2)
-    elif parameters.problem == 3:
-        return (3 * x**2 - 2*x + 1)/4
-    elif parameters.problem == 4:
-        return (np.exp(2 * x) - np.exp(-6 * x))/3
-    elif parameters.problem == 5:
-        return np.log(1 + x) + (x / (1 + x))
     else:
-        return np.exp(x) * (np.sin(x) + np.cos(x))
+        contributions = []
+
+        for point, fx_point in zip(x.tolist(), fx.tolist()):
+            Fhat_derived_x, division_by_zero = get_value_decoded_function(point, decoded_function, parameters)
+
+            if division_by_zero:
+                return None
+
+            absolute_difference = abs(Fhat_derived_x - fx_point)
+            omegai = parameters.K0 if absolute_difference <= parameters.U else parameters.K1
+            contributions.append(omegai * absolute_difference)
+
+        return contributions
+
+    with np.errstate(all="ignore"):
+        absolute_differences = np.abs(Fhat_derived_x - fx)
+        return np.where(absolute_differences <= parameters.U, parameters.K0, parameters.K1) * absolute_differences
+
+
+def get_weighted_error_from_derivative(Fhat_derived_x, parameters):
+
+    """
+    Computes the weighted error from the derivative of the decoded expression over the sample grid
+
+    :param Fhat_derived_x: derivative of the decoded expression in the sample points
+    :param parameters: parameters of the algorithm
+
+    :return: (weighted error, True)
+    """
+
+    fx = get_target_samples(parameters).fx
+
+    with np.errstate(all="ignore"):
+        absolute_differences = np.abs(Fhat_derived_x - fx)
+        omegas = np.where(absolute_differences <= parameters.U, parameters.K0, parameters.K1)
+
+        return float(np.sum(omegas * absolute_differences)), True
+
+
+def get_sample_points(parameters):
+
+    """
+    Returns the points of the interval where the approximation is evaluated
+
+    :param parameters: parameters of the algorithm
+
+    :return: read-only array with the N+1 sample points
+    """
+
+    return get_target_samples(parameters).x
 
 
 def get_value_decoded_function(x, decoded_function, parameters):
@@ -93,10 +595,11 @@ def get_value_decoded_function(x, decoded_function, parameters):
     :return: (f^(x+h) - f^(x)) / h
     """
 
+    function = get_compiled_phenotype(decoded_function, parameters)
+
     try:
-        fx = eval(f"{decoded_function}")
-        x += parameters.h
-        fx_plus_h = eval(f"{decoded_function}")
+        fx = function(x)
+        fx_plus_h = function(x + parameters.h)
 
     except ZeroDivisionError:
         return 0, True
@@ -112,36 +615,66 @@ def get_value_decoded_function(x, decoded_function, parameters):
     return (fx_plus_h - fx) / parameters.h, False
 
 
-def get_genotype_len_penalty(individual, parameters):
+def get_genotype_len_excess(individual, parameters):
 
     """
-    Function that returns the genotype length penalty component of the fitness value
+    Function that returns how many codons the genotype exceeds the maximum genotype length, gx
 
     :param individual: individual to evaluate
     :param parameters: parameters of the algorithm
 
+    :return: genotype length excess
+    """
+
+    return max(0, len(individual) - parameters.max_genotype_len)
+
+
+def get_genotype_len_penalty(gx, parameters):
+
+    """
+    Function that returns the genotype length penalty component of the fitness value
+
+    :param gx: genotype length excess (see get_genotype_len_excess)
+    :param parameters: parameters of the algorithm
+
     :return: genotype length penalty component
     """
 
-    gx = max(0, len(individual) - parameters.max_genotype_len)
     return min(parameters.lambda_genotype_len * gx,
                parameters.fitness_for_invalid_individuals)
 
 
-def get_integration_constant_penalty(decoded_function, parameters):
+def get_integration_constant_deviation(decoded_function, parameters):
+
+    """
+    Function that returns the deviation of the decoded expression from the integration constant, |F^(0) - F_0|.
+    F^(0) is always computed with the scalar expression, whatever the evaluation mode is, so every mode gives the same
+    deviation (NumPy and the math module do not agree on every value, e.g. math.cos of a huge number)
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: deviation from the integration constant; None if the decoded expression can not be evaluated in 0
+    """
+
+    function = get_compiled_phenotype(decoded_function, parameters)
+
+    try:
+        return abs(function(0) - parameters.F_0)
+    except (ZeroDivisionError, ValueError, OverflowError):
+        return None
+
+
+def get_integration_constant_penalty(hx, parameters):
 
     """
         Function that returns the integration constant penalty component of the fitness value
 
-        :param individual: individual to evaluate
+        :param hx: deviation from the integration constant (see get_integration_constant_deviation)
         :param parameters: parameters of the algorithm
 
         :return: integration constant penalty component
         """
 
-    x = 0
-    hx = abs(eval(decoded_function) - parameters.F_0)
-
     return min(parameters.lambda_integration_const * max(0, hx - parameters.epsilon_integration_constant_tol),
                parameters.fitness_for_invalid_individuals)
-
@@ -0,0 +1,402 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import random
+import sys
+import time
+import numpy as np
+from deap import creator
+from GE import create_GA_classes, setup_algorithm, run_GE
+from GE_fitness import evaluate_individual, set_fitness, phenotype_errors, compute_phenotype_error
+from expression_dag import evaluate_phenotypes_dag
+from GA_operators import (initialize_individual, parent_selection, mating, mutation, duplication, survival_selection,
+                          batched_variation)
+from compiled_phenotypes import compiled_phenotypes
+from simplification import simplified_phenotypes
+from decode_backus_naur import decode_individual, get_non_terminal_indexes, derivation_memo
+from parameters import Parameters
+
+"""
+File that runs the benchmarks of the decoder, the evaluator, the operators and whole generations of the GA with fixed
+seeds, and compares their throughput with the one stored in the baseline file. It also checks that every evaluation
+mode gives the same fitness components for a decoded population
+"""
+
+BASELINE_FILE = "benchmark_baseline.json"
+RANDOM_SEED = 42
+N_OF_INDIVIDUALS = 200
+MACRO_POPULATION_LENGTHS = (50, 100, 200)
+MACRO_N_OF_GENERATIONS = 20
+TOLERANCE = 0.25
+MIN_REPETITION_TIME = 0.2
+
+# (evaluation mode, derivative mode) checked by the parity suite. The approximation error of the first one is compared
+# with the one of the modes of EXACT_PARITY_MODES
+PARITY_MODES = (("vectorized", "finite_differences"), ("stack", "finite_differences"), ("dag", "finite_differences"),
+                ("scalar", "finite_differences"), ("vectorized", "dual"))
+EXACT_PARITY_MODES = PARITY_MODES[:3]
+PARITY_N_OF_GENERATIONS = 30
+# Relative and absolute tolerance of the deviations from the integration constant (F^(0) is computed with math or NumPy)
+PARITY_HX_TOLERANCE = 1e-9
+
+
+def clear_caches():
+
+    """
+    Empties the caches of the algorithm, so every repetition of a benchmark does the same work
+
+    :return:
+    """
+
+    phenotype_errors.clear()
+    compiled_phenotypes.clear()
+    derivation_memo.clear()
+    simplified_phenotypes.clear()
+
+
+def seed_everything(seed):
+
+    """
+    Seeds the random number generators used by the algorithm
+
+    :param seed: seed
+
+    :return:
+    """
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def time_function(function, setup=None):
+
+    """
+    Measures the wall time of a call to a function, calling it as many times as needed to spend at least
+    MIN_REPETITION_TIME seconds and keeping the best call (as timeit recommends), so the calls slowed down by the
+    machine do not count
+
+    :param function: function to measure (receives the result of setup, if it is not None)
+    :param setup: function run (and not measured) before each call
+
+    :return: best wall time of a call in seconds
+    """
+
+    total_time = 0
+    best_time = float("inf")
+
+    while total_time < MIN_REPETITION_TIME:
+        setup_result = None if setup is None else setup()
+        arguments = () if setup_result is None else (setup_result,)
+
+        # The garbage collector is disabled while measuring, as in timeit
+        gc.disable()
+        start = time.perf_counter()
+        function(*arguments)
+        call_time = time.perf_counter() - start
+        gc.enable()
+
+        total_time += call_time
+        best_time = min(best_time, call_time)
+
+    return best_time
+
+
+def time_benchmarks(benchmarks, repetitions):
+
+    """
+    Measures several functions keeping the best of several repetitions of each one. Repetitions are interleaved (one
+    repetition of every function, then the next one), so a slow period of the machine does not affect all the
+    repetitions of a single benchmark
+
+    :param benchmarks: dictionary name -> (function, setup) (see time_function)
+    :param repetitions: number of repetitions of each benchmark
+
+    :return: dictionary name -> best wall time of a call in seconds
+    """
+
+    best_times = {name: float("inf") for name in benchmarks}
+
+    for _ in range(repetitions):
+        for name, (function, setup) in benchmarks.items():
+            best_times[name] = min(best_times[name], time_function(function, setup))
+
+    return best_times
+
+
+def get_benchmark_population(parameters, toolbox):
+
+    """
+    Creates a fixed population of evaluated individuals
+
+    :param parameters: parameters of the algorithm
+    :param toolbox: toolbox of the algorithm
+
+    :return: population
+    """
+
+    seed_everything(RANDOM_SEED)
+    population = [initialize_individual(creator.Individual, parameters) for _ in range(N_OF_INDIVIDUALS)]
+
+    clear_caches()
+    for individual in population:
+        set_fitness(individual, evaluate_individual(individual, parameters), parameters)
+
+    return population
+
+
+def run_micro_benchmarks(repetitions):
+
+    """
+    Measures the throughput of the decoder, the evaluation of each problem and each operator of the GA
+
+    :param repetitions: number of repetitions of each benchmark
+
+    :return: dictionary name -> throughput (operations per second)
+    """
+
+    parameters = Parameters()
+    parameters.population_length = N_OF_INDIVIDUALS
+    toolbox = setup_algorithm(parameters, create_GA_classes(parameters))
+    population = get_benchmark_population(parameters, toolbox)
+
+    def decode_population():
+        for individual in population:
+            decode_individual(individual, parameters)
+
+    def get_non_terminal_indexes_population():
+        for individual in population:
+            get_non_terminal_indexes(individual, parameters)
+
+    benchmarks = {
+        "decode_individual": (decode_population, clear_caches),
+        "get_non_terminal_indexes": (get_non_terminal_indexes_population, clear_caches),
+    }
+
+    for problem in range(1, 7):
+        problem_parameters = Parameters()
+        problem_parameters.problem = problem
+        problem_parameters.compute_problem_parameters()
+        problem_parameters.compute_N()
+
+        def evaluate_population(problem_parameters=problem_parameters):
+            for individual in population:
+                evaluate_individual(individual, problem_parameters)
+
+        benchmarks[f"evaluate_individual_problem_{problem}"] = (evaluate_population, clear_caches)
+
+    def clone_population():
+        seed_everything(RANDOM_SEED)
+        return [toolbox.clone(individual) for individual in population]
+
+    def clone_populations():
+        offspring = clone_population()
+        return clone_population(), offspring
+
+    def initialize_population(_):
+        for _ in range(N_OF_INDIVIDUALS):
+            initialize_individual(creator.Individual, parameters)
+
+    benchmarks.update({
+        "initialize_individual": (initialize_population, clone_population),
+        "parent_selection": (lambda individuals: parent_selection(individuals, parameters, toolbox), clone_population),
+        "mating": (lambda individuals: mating(parameters, individuals, toolbox), clone_population),
+        "mutation": (lambda individuals: mutation(individuals, parameters), clone_population),
+        "duplication": (lambda individuals: duplication(individuals, parameters, toolbox), clone_population),
+        "batched_variation": (lambda individuals: batched_variation(individuals, parameters, toolbox),
+                              clone_population),
+        # The population and the offspring are cloned before each call, out of the measured time
+        "survival_selection": (lambda populations: survival_selection(*populations, parameters, toolbox),
+                               clone_populations),
+    })
+
+    return {name: N_OF_INDIVIDUALS / best_time for name, best_time in time_benchmarks(benchmarks, repetitions).items()}
+
+
+def run_macro_benchmarks(repetitions):
+
+    """
+    Measures the throughput of whole generations of the GA with several population lengths
+
+    :param repetitions: number of repetitions of each benchmark
+
+    :return: dictionary name -> throughput (generations or evaluations per second)
+    """
+
+    results = {}
+
+    for population_length in MACRO_POPULATION_LENGTHS:
+
+        best_time = float("inf")
+        n_of_evaluations = 0
+
+        for _ in range(repetitions):
+            parameters = Parameters()
+            parameters.population_length = population_length
+            parameters.max_gens = MACRO_N_OF_GENERATIONS
+            parameters.min_assumable_fitness = -1
+
+            clear_caches()
+            seed_everything(RANDOM_SEED)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, _, _, n_of_evaluations = run_GE(parameters, verbose=False)
+            best_time = min(best_time, time.perf_counter() - start)
+
+        results[f"generations_population_{population_length}"] = MACRO_N_OF_GENERATIONS / best_time
+        results[f"evaluations_population_{population_length}"] = n_of_evaluations / best_time
+
+    return results
+
+
+def get_parity_errors(decoded_function, parameters, evaluation_mode, derivative_mode):
+
+    """
+    Computes the approximation error and the deviation from the integration constant of a decoded expression in an
+    evaluation mode
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+    :param evaluation_mode: "scalar", "vectorized", "stack" or "dag"
+    :param derivative_mode: "finite_differences" or "dual"
+
+    :return: (approximation error, |F^(0) - F_0|); (None, None) if the expression is not valid
+    """
+
+    parameters.evaluation_mode = "vectorized" if evaluation_mode == "dag" else evaluation_mode
+    parameters.derivative_mode = derivative_mode
+
+    if evaluation_mode == "dag":
+        return evaluate_phenotypes_dag([decoded_function], parameters)[decoded_function]
+
+    return compute_phenotype_error(decoded_function, parameters)
+
+
+def check_evaluation_parity():
+
+    """
+    Evaluates the decoded expressions found by a short run of the GA in every evaluation mode, for every problem. The
+    deviation from the integration constant must be the same (up to PARITY_HX_TOLERANCE, as some modes compute F^(0)
+    with NumPy and others with math) in every mode where the expression is valid, and the approximation error and the
+    validity must be the same in the modes that share the NumPy evaluation (the scalar mode sums in another order and
+    the dual mode uses the exact derivative, so they may even disagree on the validity of the expression)
+
+    :return: list of (problem, decoded expression, evaluation mode, value, expected value) for each mismatch
+    """
+
+    mismatches = []
+
+    # Expressions found by a short run of the GA (the ones of random individuals are too simple)
+    parameters = Parameters()
+    parameters.max_gens = PARITY_N_OF_GENERATIONS
+    parameters.min_assumable_fitness = -1
+
+    clear_caches()
+    seed_everything(RANDOM_SEED)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_GE(parameters, verbose=False)
+
+    decoded_functions = {key[0] for key in phenotype_errors.entries}
+
+    for problem in range(1, 7):
+        problem_parameters = Parameters()
+        problem_parameters.problem = problem
+        problem_parameters.compute_problem_parameters()
+        problem_parameters.compute_N()
+
+        for decoded_function in sorted(decoded_functions):
+            clear_caches()
+
+            errors = {mode: get_parity_errors(decoded_function, problem_parameters, *mode) for mode in PARITY_MODES}
+            error, hx = errors[PARITY_MODES[0]]
+
+            for mode, (mode_error, mode_hx) in errors.items():
+                if mode in EXACT_PARITY_MODES and (mode_error != error or (mode_hx is None) != (hx is None)):
+                    mismatches.append((problem, decoded_function, "/".join(mode), (mode_error, mode_hx), (error, hx)))
+                elif (hx is not None and mode_hx is not None
+                      and not np.isclose(mode_hx, hx, rtol=PARITY_HX_TOLERANCE, atol=PARITY_HX_TOLERANCE)):
+                    mismatches.append((problem, decoded_function, "/".join(mode), mode_hx, hx))
+
+    return mismatches
+
+
+def compare_with_baseline(results, baseline, tolerance):
+
+    """
+    Finds the benchmarks whose throughput is lower than the one of the baseline by more than tolerance
+
+    :param results: throughput of each benchmark
+    :param baseline: throughput of each benchmark in the baseline
+    :param tolerance: allowed relative loss of throughput
+
+    :return: list of (name, throughput, baseline throughput)
+    """
+
+    return [(name, throughput, baseline[name]) for name, throughput in results.items()
+            if name in baseline and throughput < (1 - tolerance) * baseline[name]]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the GE")
+    parser.add_argument("--suite", choices=("all", "micro", "macro", "parity"), default="all")
+    parser.add_argument("--repetitions", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    arguments = parser.parse_args()
+
+    if arguments.suite in ("all", "parity"):
+        mismatches = check_evaluation_parity()
+
+        for problem, decoded_function, mode, value, expected_value in mismatches:
+            print(f"Parity mismatch in problem {problem} ({mode}): {value} != {expected_value} for {decoded_function}")
+
+        if mismatches:
+            sys.exit(1)
+
+        print("Every evaluation mode gives the same fitness components")
+
+        if arguments.suite == "parity":
+            return
+
+    results = {}
+    if arguments.suite in ("all", "micro"):
+        results.update(run_micro_benchmarks(arguments.repetitions))
+    if arguments.suite in ("all", "macro"):
+        results.update(run_macro_benchmarks(arguments.repetitions))
+
+    if arguments.save_baseline:
+        with open(arguments.baseline, "w") as file:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(), "results": results},
+                      file, indent=1)
+
+        print(f"{arguments.baseline} succesfully generated")
+        return
+
+    try:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)["results"]
+    except FileNotFoundError:
+        baseline = {}
+
+    print("benchmark\tthroughput (per second)\tbaseline")
+    print("-------------------------------------------------------------")
+    for name, throughput in results.items():
+        print(f"{name}\t{throughput:.1f}\t{baseline.get(name, float('nan')):.1f}")
+
+    regressions = compare_with_baseline(results, baseline, arguments.tolerance)
+
+    for name, throughput, baseline_throughput in regressions:
+        print(f"Regression in {name}: {throughput:.1f} < {baseline_throughput:.1f}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+"""
+File that contains the bounded caches used to avoid repeating work on phenotypes that have already been seen
+"""
+
+
+class LRUCache:
+
+    """
+    Bounded cache that evicts the least recently used entry when it is full. It is shared by the threads of the
+    thread executor, so every access holds a lock
+    """
+
+    def __init__(self, max_size):
+
+        """
+        Creates an empty cache
+
+        :param max_size: maximum number of entries
+        """
+
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+
+        """
+        Returns the value stored for key, marking it as the most recently used entry
+
+        :param key: key
+        :param default: value returned if the key is not stored
+
+        :return: stored value (default if not found)
+        """
+
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+
+        """
+        Stores a value, evicting the least recently used entries if the cache is full
+
+        :param key: key
+        :param value: value
+
+        :return:
+        """
+
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+
+        """
+        Removes every entry
+
+        :return:
+        """
+
+        with self.lock:
+            self.entries.clear()
+
+    def reset_statistics(self):
+
+        """
+        Sets the hit, miss and eviction counters to zero
+
+        :return:
+        """
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def statistics(self):
+
+        """
+        Returns the counters of the cache
+
+        :return: dictionary with the number of hits, misses, evictions and stored entries
+        """
+
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries)}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
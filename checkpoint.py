@@ -0,0 +1,118 @@
+import os
+import pickle
+import random
+import tempfile
+import numpy as np
+from GA_operators import pack_individuals, unpack_individuals
+
+"""
+File that contains the checkpoints of the GA: the state of a run between two generations (population, random number
+generators, parameters with their lambdas, counters and logs) is stored in a binary file, so the run can be resumed
+giving the same result as if it had not been stopped
+"""
+
+
+def save_checkpoint(file_path, population, generation, number_of_evaluations, success, parameters):
+
+    """
+    Stores the state of a run in a checkpoint file. It is written to a temporary file that then replaces the
+    checkpoint, so an interrupted write never leaves a corrupt checkpoint
+
+    :param file_path: path of the checkpoint file
+    :param population: current population (already evaluated)
+    :param generation: current generation
+    :param number_of_evaluations: number of evaluations done
+    :param success: whether the run has finished successfully
+    :param parameters: parameters of the algorithm
+
+    :return:
+    """
+
+    checkpoint = get_checkpoint(population, generation, number_of_evaluations, success, parameters)
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+
+    with tempfile.NamedTemporaryFile("wb", dir=directory, delete=False) as file:
+        pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(file.name, file_path)
+
+
+def load_checkpoint(file_path, individual_class):
+
+    """
+    Reads the state of a run from a checkpoint file and restores the state of the random number generators
+
+    :param file_path: path of the checkpoint file
+    :param individual_class: class of the individuals
+
+    :return: (population, generation, number of evaluations, success, parameters) (see save_checkpoint)
+    """
+
+    with open(file_path, "rb") as file:
+        checkpoint = pickle.load(file)
+
+    return restore_checkpoint(checkpoint, individual_class)
+
+
+def get_checkpoint(population, generation, number_of_evaluations, success, parameters):
+
+    """
+    Returns the state of a run (including the state of the random number generators) as a picklable dictionary
+
+    :param population: current population (already evaluated)
+    :param generation: current generation
+    :param number_of_evaluations: number of evaluations done
+    :param success: whether the run has finished successfully
+    :param parameters: parameters of the algorithm
+
+    :return: checkpoint
+    """
+
+    codons, offsets = pack_individuals(population)
+
+    return {
+        "codons": codons,
+        "offsets": offsets,
+        "fitness_values": np.array([individual.fitness.values[0] for individual in population]),
+        "integration_constant_feasible": [individual.integration_constant_feasible for individual in population],
+        "fitness_components": [individual.fitness_components for individual in population],
+        "partially_evaluated": [getattr(individual, "partially_evaluated", False) for individual in population],
+        "generation": generation,
+        "number_of_evaluations": number_of_evaluations,
+        "success": success,
+        "numpy_random_state": np.random.get_state(),
+        "random_state": random.getstate(),
+        "parameters": parameters,
+    }
+
+
+def restore_checkpoint(checkpoint, individual_class):
+
+    """
+    Rebuilds the state of a run from a checkpoint and restores the state of the random number generators
+
+    :param checkpoint: checkpoint (see get_checkpoint)
+    :param individual_class: class of the individuals
+
+    :return: (population, generation, number of evaluations, success, parameters) (see get_checkpoint)
+    """
+
+    population = unpack_individuals(checkpoint["codons"], checkpoint["offsets"], individual_class)
+
+    for individual, fitness_value, integration_constant_feasible, fitness_components, partially_evaluated in zip(
+            population, checkpoint["fitness_values"].tolist(), checkpoint["integration_constant_feasible"],
+            checkpoint["fitness_components"], checkpoint["partially_evaluated"]):
+
+        individual.fitness.values = fitness_value,
+        individual.integration_constant_feasible = integration_constant_feasible
+        individual.fitness_components = fitness_components
+        individual.partially_evaluated = partially_evaluated
+
+    np.random.set_state(checkpoint["numpy_random_state"])
+    random.setstate(checkpoint["random_state"])
+
+    return (population, checkpoint["generation"], checkpoint["number_of_evaluations"], checkpoint["success"],
+            checkpoint["parameters"])
@@ -0,0 +1,57 @@
+import math
+from caching import LRUCache
+from vectorized_evaluation import compile_vectorized_expression
+from dual_numbers import compile_dual_expression
+from stack_machine import compile_program
+
+"""
+File that contains the cache of compiled phenotypes. Each decoded expression is compiled only once into a function of
+x, that is reused by every evaluation of the expression (fitness calculation and local search)
+"""
+
+compiled_phenotypes = LRUCache(max_size=10000)
+
+
+def compile_scalar_expression(decoded_function):
+
+    """
+    Compiles a decoded expression into a function of x that works with python floats
+
+    :param decoded_function: decoded expression
+
+    :return: function of x
+    """
+
+    return eval(compile(f"lambda x: {decoded_function}", "<decoded_function>", "eval"), {"math": math})
+
+
+def get_compiled_phenotype(decoded_function, parameters, kind="scalar"):
+
+    """
+    Returns the function of x corresponding to a decoded expression, compiling it if it is not in the cache
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+    :param kind: "scalar" (python floats), "vectorized" (NumPy arrays), "dual" (dual numbers over NumPy arrays) or
+                 "stack" (postfix program of the stack machine over NumPy arrays)
+
+    :return: function of x
+    """
+
+    key = (decoded_function, kind)
+    function = compiled_phenotypes.get(key)
+
+    if function is None:
+        if kind == "vectorized":
+            function = compile_vectorized_expression(decoded_function)
+        elif kind == "dual":
+            function = compile_dual_expression(decoded_function)
+        elif kind == "stack":
+            function = compile_program(decoded_function)
+        else:
+            function = compile_scalar_expression(decoded_function)
+
+        compiled_phenotypes.max_size = parameters.compiled_phenotypes_cache_size
+        compiled_phenotypes.put(key, function)
+
+    return function
@@ -1,3 +1,8 @@
+import os
+import re
+from caching import LRUCache
+from simplification import simplify_phenotype
+
 """
 File that contain all the operators corresponding to individual decodification
 """
@@ -5,7 +10,8 @@ File that contain all the operators corresponding to individual decodification
 def decode_individual(individual, parameters):
 
     """
-    Function that decodes an individutal into a mathematical expression
+    Function that decodes an individutal into a mathematical expression (simplified if parameters.simplify_phenotypes
+    is set, see simplification.py)
 
     :param individual: individual to decode
     :param parameters: parameters of the algorithm
@@ -13,98 +19,272 @@ def decode_individual(individual, parameters):
     :return: decoded_expression (str), successful_decoding (boolean)
     """
 
-    # Initial expression
-    S = ["<expr>"]
+    parameters.n_of_decodes += 1
+
+    tokens, _, _, correctly_decoded = derive_individual(individual, parameters)
+
+    if not correctly_decoded:
+        return "", False
+
+    return simplify_phenotype(tokens_to_expression(tokens, parameters), parameters), True
+
+
+def tokens_to_expression(tokens, parameters):
+
+    """
+    Joins the terminal tokens of a derivation into an expression
+
+    :param tokens: terminal tokens (see derive_individual)
+    :param parameters: parameters of the algorithm
+
+    :return: expression (str)
+    """
+
+    grammar = get_grammar(parameters)
+    return "".join([grammar.terminals[token - grammar.n_non_terminals] for token in tokens])
+
+
+def derive_individual(individual, parameters, record_codon_uses=False):
+
+    """
+    Performs the leftmost derivation of an individual in a single pass. The pending symbols of the derivation are kept
+    in a stack of integer tokens (see compile_grammar), so each codon only pops a non-terminal and pushes the tokens of
+    the production rule it selects in the codon table of the non-terminal
+
+    :param individual: individual to derive
+    :param parameters: parameters of the algorithm
+    :param record_codon_uses: whether to record each use of a codon in the derivation as a tuple (codon index,
+                              non-terminal, position of its first token in the expression, number of tokens of the
+                              selected rule)
+
+    :return: terminal tokens of the expression, uses of the codons, number of wrappings, successful_decoding (boolean)
+    """
+
+    grammar = get_grammar(parameters)
+    n_non_terminals = grammar.n_non_terminals
+    codon_rules = grammar.codon_rules
 
-    decoded_expression = S[0]
+    stack = [grammar.start_symbol]
+    tokens = []
+    codon_uses = []
 
     current_codon_idx = 0
     n_wrapping = 0
-    continue_decoding = True
+    genotype_length = len(individual)
+
+    use_memo = parameters.decoding_memo and not record_codon_uses
+    if use_memo:
+        derivation_memo.resize(parameters.decoding_memo_size)
+        derivation_memo.select_grammar(grammar)
+        current_codon_idx, stack, tokens = derivation_memo.resume(individual, parameters.decoding_memo_stride, stack,
+                                                                   tokens)
 
-    while continue_decoding:
+    while True:
 
-        # Finds the first non terminal in the current expression
-        first_non_terminal = find_first_non_terminal(decoded_expression)
+        # Moves the terminals at the top of the stack to the expression until a non-terminal is found
+        while stack and stack[-1] >= n_non_terminals:
+            tokens.append(stack.pop())
 
-        if first_non_terminal == "":
+        if not stack:
             parameters.wrappings_by_individual.append(n_wrapping)
-            return decoded_expression, True
+            return tokens, codon_uses, n_wrapping, True
+
+        non_terminal = stack.pop()
+
+        rule = codon_rules[non_terminal][individual[current_codon_idx]]
+        stack.extend(rule)
 
-        # Gets the producion rules corresponding to the first non-terminal expression and replaces it with
-        # a new expression
-        production_rules = get_prodution_rules_for_non_terminal(first_non_terminal)
-        n_of_rules = len(production_rules)
-        current_codon = individual[current_codon_idx]
-        rule_idx = current_codon % n_of_rules
-        rule = production_rules[rule_idx]
-        decoded_expression = decoded_expression.replace(first_non_terminal, rule, 1)
+        if record_codon_uses:
+            codon_uses.append((current_codon_idx, non_terminal, len(tokens), len(rule)))
 
         current_codon_idx += 1
 
-        if current_codon_idx >= len(individual):
+        if current_codon_idx >= genotype_length:
             n_wrapping += 1
             current_codon_idx = 0
 
-        if n_wrapping > parameters.max_wrapping:
-            parameters.wrappings_by_individual.append(n_wrapping)
-            continue_decoding = False
+            if n_wrapping > parameters.max_wrapping:
+                parameters.wrappings_by_individual.append(n_wrapping)
+                return tokens, codon_uses, n_wrapping, False
 
-    return "", False
+        elif use_memo and n_wrapping == 0 and current_codon_idx % parameters.decoding_memo_stride == 0:
+            derivation_memo.store(individual, current_codon_idx, stack, tokens)
 
 
-def find_first_non_terminal(expression):
+class DerivationMemo:
 
     """
-    Returns the first non-terminal in the expression
+    Bounded memo of partial derivations keyed by codon prefixes. Before the first wrapping, the state of the
+    derivation after k codons (pending symbols and terminal tokens) only depends on the first k codons, so individuals
+    that share a prefix (children of one point mating) can resume their derivation from the longest stored prefix.
+    States are stored every stride codons and the least recently used ones are evicted
+    """
 
-    :param expression: expression where non-terminals are being search
+    def __init__(self, max_size):
 
-    :return: first non-terminal ("", if the is not any)
-    """
+        """
+        Creates an empty memo
+
+        :param max_size: maximum number of stored states
+        """
+
+        self.states = LRUCache(max_size)
+        self.grammar = None
+
+        self.lookups = 0
+        self.resumed_derivations = 0
+        self.resumed_codons = 0
+
+    def resize(self, max_size):
+
+        """
+        Changes the maximum number of stored states
+
+        :param max_size: maximum number of stored states
+
+        :return:
+        """
+
+        self.states.max_size = max_size
+
+    def select_grammar(self, grammar):
+
+        """
+        Sets the grammar of the derivations, removing every stored state if it changes
 
-    for i, char in enumerate(expression):
+        :param grammar: grammar of the derivations (see get_grammar)
 
-        if char == "<":
-            first_idx = i
-            last_idx = i
+        :return:
+        """
 
-            while expression[last_idx] != ">":
-                last_idx += 1
+        if grammar is not self.grammar:
+            self.states.clear()
+            self.grammar = grammar
 
-            return expression[first_idx:last_idx+1]
+    def resume(self, individual, stride, stack, tokens):
 
-    return ""
+        """
+        Returns the state of the derivation of the longest prefix of the individual stored in the memo
 
+        :param individual: individual to derive
+        :param stride: distance between stored prefixes
+        :param stack: initial stack of the derivation
+        :param tokens: initial terminal tokens of the derivation
 
-def get_prodution_rules_for_non_terminal(non_terminal):
+        :return: index of the next codon, stack, terminal tokens
+        """
+
+        self.lookups += 1
+
+        prefix_length = ((len(individual) - 1) // stride) * stride
+
+        while prefix_length > 0:
+
+            # A single lookup, since other threads may evict the state between two of them
+            state = self.states.get(bytes(individual[:prefix_length]))
+
+            if state is not None:
+                state_stack, state_tokens = state
+
+                self.resumed_derivations += 1
+                self.resumed_codons += prefix_length
+
+                return prefix_length, list(state_stack), list(state_tokens)
+
+            prefix_length -= stride
+
+        return 0, stack, tokens
+
+    def store(self, individual, prefix_length, stack, tokens):
+
+        """
+        Stores the state of the derivation after the first prefix_length codons of the individual
+
+        :param individual: individual being derived
+        :param prefix_length: number of codons consumed
+        :param stack: current stack of the derivation
+        :param tokens: current terminal tokens of the derivation
+
+        :return:
+        """
+
+        key = bytes(individual[:prefix_length])
+
+        if key not in self.states:
+            self.states.put(key, (tuple(stack), tuple(tokens)))
+
+    def statistics(self):
+
+        """
+        Returns the counters of the memo
+
+        :return: dictionary with the number of lookups, resumed derivations, hit rate, skipped codons, evictions and
+                 stored states
+        """
+
+        return {"lookups": self.lookups, "resumed_derivations": self.resumed_derivations,
+                "hit_rate": self.resumed_derivations / self.lookups if self.lookups > 0 else 0,
+                "resumed_codons": self.resumed_codons, "evictions": self.states.evictions, "size": len(self.states)}
+
+    def clear(self):
+
+        """
+        Removes every stored state
+
+        :return:
+        """
+
+        self.states.clear()
+
+
+def get_terminal_codon_indexes(codon_uses, parameters):
 
     """
-    Returs the list of production rules of a certain non-terminal
+    Returns the indexes of the codons that select a terminal, in the order they are used in the derivation
 
-    :param non_terminal: non-terminal
+    :param codon_uses: uses of the codons (see derive_individual)
+    :param parameters: parameters of the algorithm
 
-    :return: production rules
+    :return: list of terminal codons indexes (with repetitions if a codon is used several times)
     """
 
-    expr = ["<expr><op><expr>", "(<expr><op><expr>)", "<pre_op>(<expr>)", "<var>"]
-    op = ["+", "-", "*", "/"]
-    pre_op = ["math.sin", "math.cos", "math.exp", "math.log"]
-    var = ["x", "<integer>"]
-    integer = ["1.0", "2.0", "3.0", "4.0", "5.0", "6.0", "7.0", "8.0", "9.0"]
+    terminal_non_terminals = get_grammar(parameters).terminal_non_terminals
+
+    return [codon_idx for codon_idx, non_terminal, _, _ in codon_uses if terminal_non_terminals[non_terminal]]
+
+
+def derive_neighbor(tokens, codon_uses, codon_idx, new_codon, parameters):
+
+    """
+    Obtains the expression of an individual in which only one codon has changed from the derivation of the original
+    individual. If the codon only selects terminals, the structure of the derivation does not change, so it is enough
+    to replace the tokens selected by the codon
+
+    :param tokens: terminal tokens of the original individual (see derive_individual)
+    :param codon_uses: uses of the codons of the original individual (see derive_individual)
+    :param codon_idx: index of the changed codon
+    :param new_codon: new value of the codon
+    :param parameters: parameters of the algorithm
+
+    :return: terminal tokens of the new individual (None if the codon selects some non-terminal)
+    """
+
+    grammar = get_grammar(parameters)
+
+    uses = [(non_terminal, token_position, n_of_tokens) for idx, non_terminal, token_position, n_of_tokens
+            in codon_uses if idx == codon_idx]
+
+    if any(not grammar.terminal_non_terminals[non_terminal] for non_terminal, _, _ in uses):
+        return None
+
+    new_tokens = list(tokens)
+
+    # Last uses go first, so positions of previous uses are not shifted by rules of different length
+    for non_terminal, token_position, n_of_tokens in reversed(uses):
+        rule = grammar.codon_rules[non_terminal][new_codon]
+        new_tokens[token_position:token_position + n_of_tokens] = reversed(rule)
 
-    if non_terminal == "<expr>":
-        return expr
-    elif non_terminal == "<op>":
-        return op
-    elif non_terminal == "<pre_op>":
-        return pre_op
-    elif non_terminal == "<var>":
-        return var
-    elif non_terminal == "<integer>":
-        return integer
-    else:
-        raise Exception('Trying to decode an invalid non terminal expression: {}'.format(non_terminal))
+    return new_tokens
 
 
 def get_non_terminal_indexes(individual, parameters):
@@ -118,45 +298,208 @@ def get_non_terminal_indexes(individual, parameters):
     :return: list of terminal codons indexes
     """
 
-    S = ["<expr>"]
+    _, codon_uses, _, correctly_decoded = derive_individual(individual, parameters, record_codon_uses=True)
 
-    decoded_expression = S[0]
+    return list(set(get_terminal_codon_indexes(codon_uses, parameters))), correctly_decoded
 
-    current_codon_idx = 0
-    n_wrapping = 0
-    continue_decoding = True
 
-    terminal_idx_list = []
+def split_production_rule(rule):
 
-    while continue_decoding:
+    """
+    Splits a production rule into its non-terminals and its terminal strings
 
-        first_non_terminal = find_first_non_terminal(decoded_expression)
+    :param rule: production rule
 
-        if first_non_terminal == "":
-            parameters.wrappings_by_individual.append(n_wrapping)
-            return list(set(terminal_idx_list)), True
+    :return: list of symbols
+    """
 
-        if first_non_terminal != "<expr>" and first_non_terminal != "<var>":
-            terminal_idx_list.append(current_codon_idx)
+    symbols = []
+    current_idx = 0
 
-        production_rules = get_prodution_rules_for_non_terminal(first_non_terminal)
-        n_of_rules = len(production_rules)
+    while current_idx < len(rule):
 
-        current_codon = individual[current_codon_idx]
+        first_idx = rule.find("<", current_idx)
 
-        rule_idx = current_codon % n_of_rules
-        rule = production_rules[rule_idx]
+        if first_idx == -1:
+            symbols.append(rule[current_idx:])
+            break
 
-        decoded_expression = decoded_expression.replace(first_non_terminal, rule, 1)
+        if first_idx > current_idx:
+            symbols.append(rule[current_idx:first_idx])
 
-        current_codon_idx += 1
+        last_idx = rule.index(">", first_idx)
+        symbols.append(rule[first_idx:last_idx+1])
+        current_idx = last_idx + 1
 
-        if current_codon_idx >= len(individual):
-            n_wrapping += 1
-            current_codon_idx = 0
+    return symbols
 
-            if n_wrapping > parameters.max_wrapping:
-                parameters.wrappings_by_individual.append(n_wrapping)
-                continue_decoding = False
 
-    return list(set(terminal_idx_list)), False
+def get_terminal_operators(terminal):
+
+    """
+    Returns the operators and functions used by a terminal of the grammar (functions of the math module without the
+    math. prefix). The variable x, numbers, parentheses and commas are not operators
+
+    :param terminal: terminal string
+
+    :return: set of operators and functions
+    """
+
+    operators = set()
+
+    for symbol in TERMINAL_SYMBOLS.findall(terminal):
+        if symbol[0].isdigit() or (symbol[0] == "." and len(symbol) > 1) or symbol in ("x", "(", ")", ","):
+            continue
+
+        operators.add(symbol[len("math."):] if symbol.startswith("math.") else symbol)
+
+    return operators
+
+
+class Grammar:
+
+    """
+    Grammar compiled into integer tables (see compile_grammar)
+    """
+
+    def __init__(self, non_terminals, terminals, reversed_production_rules, terminal_non_terminals):
+
+        """
+        :param non_terminals: names of the non-terminals (the first one is the start symbol)
+        :param terminals: terminal strings
+        :param reversed_production_rules: tokens of each production rule of each non-terminal, reversed
+        :param terminal_non_terminals: whether each non-terminal only produces terminals
+        """
+
+        self.non_terminals = non_terminals
+        self.terminals = terminals
+        self.n_non_terminals = len(non_terminals)
+        self.start_symbol = 0
+        self.reversed_production_rules = reversed_production_rules
+        self.terminal_non_terminals = terminal_non_terminals
+
+        # Rule selected by each codon value (0-255) for each non-terminal, so no modulo is needed while decoding
+        self.codon_rules = [tuple(rules[codon % len(rules)] for codon in range(256))
+                            for rules in reversed_production_rules]
+
+
+def read_bnf(file_path):
+
+    """
+    Reads a grammar written in BNF: one line per non-terminal with its production rules separated by |
+    (<non_terminal> ::= rule | rule ...). Lines starting with | continue the rules of the previous non-terminal, and
+    lines starting with # are comments. Spaces around the rules are ignored
+
+    :param file_path: path of the BNF file
+
+    :return: list of non-terminals (in the order they are defined), dictionary non-terminal -> production rules
+    """
+
+    non_terminals = []
+    production_rules = {}
+
+    with open(file_path) as file:
+        for line in file:
+
+            line = line.strip()
+
+            if not line or line.startswith("#"):
+                continue
+
+            if line.startswith("|"):
+                if not non_terminals:
+                    raise Exception('Production rules without non terminal in the grammar: {}'.format(line))
+
+                non_terminal, rules = non_terminals[-1], line[1:]
+
+            else:
+                non_terminal, separator, rules = line.partition("::=")
+                non_terminal = non_terminal.strip()
+
+                if not separator or not (non_terminal.startswith("<") and non_terminal.endswith(">")):
+                    raise Exception('Invalid line in the grammar: {}'.format(line))
+
+                if non_terminal not in production_rules:
+                    non_terminals.append(non_terminal)
+                    production_rules[non_terminal] = []
+
+            production_rules[non_terminal].extend(rule.strip() for rule in rules.split("|"))
+
+    return non_terminals, production_rules
+
+
+def compile_grammar(non_terminals, production_rules):
+
+    """
+    Compiles the grammar into integer tokens. Non-terminals are numbered from 0 to len(non_terminals)-1 and terminals
+    from len(non_terminals) on. Production rules are stored reversed, so they can be pushed directly into the
+    derivation stack
+
+    :param non_terminals: list of non-terminals (the first one is the start symbol)
+    :param production_rules: dictionary non-terminal -> production rules
+
+    :return: grammar
+    """
+
+    terminals = []
+    reversed_production_rules = []
+    terminal_non_terminals = []
+
+    for non_terminal in non_terminals:
+
+        rules = []
+        only_terminals = True
+
+        for rule in production_rules[non_terminal]:
+
+            rule_tokens = []
+
+            for symbol in split_production_rule(rule):
+
+                if symbol in non_terminals:
+                    rule_tokens.append(non_terminals.index(symbol))
+                    only_terminals = False
+                elif symbol.startswith("<") and symbol.endswith(">"):
+                    raise Exception('Trying to decode an invalid non terminal expression: {}'.format(symbol))
+                else:
+                    if symbol not in terminals:
+                        terminals.append(symbol)
+                    rule_tokens.append(len(non_terminals) + terminals.index(symbol))
+
+            rules.append(tuple(reversed(rule_tokens)))
+
+        reversed_production_rules.append(tuple(rules))
+        terminal_non_terminals.append(only_terminals)
+
+    return Grammar(non_terminals, terminals, reversed_production_rules, terminal_non_terminals)
+
+
+def get_grammar(parameters):
+
+    """
+    Returns the grammar of parameters.grammar_file, reading and compiling it only the first time it is used
+
+    :param parameters: parameters of the algorithm
+
+    :return: grammar
+    """
+
+    grammar = grammars.get(parameters.grammar_file)
+
+    if grammar is None:
+        # Relative paths are relative to the directory of this file
+        file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), parameters.grammar_file)
+
+        grammar = compile_grammar(*read_bnf(file_path))
+        grammars[parameters.grammar_file] = grammar
+
+    return grammar
+
+
+# Compiled grammars, by grammar file
+grammars = {}
+
+# Numbers, names (with their attributes) and operators of the terminals
+TERMINAL_SYMBOLS = re.compile(r"\d*\.?\d+(?:[eE][+-]?\d+)?|[A-Za-z_][\w.]*|\*\*|//|\S")
+
+derivation_memo = DerivationMemo(max_size=20000)
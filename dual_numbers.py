@@ -0,0 +1,208 @@
+import numpy as np
+from vectorized_evaluation import (protected_division, protected_sin, protected_cos, protected_exp, protected_log,
+                                   compile_vectorized_expression)
+
+"""
+File that contains the forward-mode automatic differentiation of decoded expressions. Each value is a dual number
+that carries the value of the expression and its exact derivative over an array of sample points, so the derivative
+does not need to be approximated with finite differences
+"""
+
+
+class Dual:
+
+    """
+    Dual number: value + derivative * epsilon (epsilon ** 2 = 0)
+    """
+
+    __slots__ = ("value", "derivative")
+
+    def __init__(self, value, derivative):
+
+        """
+        Creates a dual number
+
+        :param value: value (array or float)
+        :param derivative: derivative (array or float)
+        """
+
+        self.value = value
+        self.derivative = derivative
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self.derivative + other.derivative)
+        return Dual(self.value + other, self.derivative)
+
+    def __radd__(self, other):
+        return Dual(other + self.value, self.derivative)
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, self.derivative - other.derivative)
+        return Dual(self.value - other, self.derivative)
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, -self.derivative)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, self.derivative * other.value + self.value * other.derivative)
+        return Dual(self.value * other, self.derivative * other)
+
+    def __rmul__(self, other):
+        return Dual(other * self.value, other * self.derivative)
+
+    def __neg__(self):
+        return Dual(-self.value, -self.derivative)
+
+
+def dual_division(numerator, denominator):
+
+    """
+    Division of dual numbers (or floats) that returns NaN where the denominator is zero
+
+    :param numerator: numerator
+    :param denominator: denominator
+
+    :return: numerator / denominator
+    """
+
+    if not isinstance(numerator, Dual) and not isinstance(denominator, Dual):
+        return protected_division(numerator, denominator)
+
+    numerator_value, numerator_derivative = get_value_and_derivative(numerator)
+    denominator_value, denominator_derivative = get_value_and_derivative(denominator)
+
+    value = protected_division(numerator_value, denominator_value)
+    derivative = protected_division(numerator_derivative - value * denominator_derivative, denominator_value)
+
+    return Dual(value, derivative)
+
+
+def dual_sin(value):
+
+    """
+    Sine of a dual number (or float)
+
+    :param value: argument
+
+    :return: sin(value)
+    """
+
+    if not isinstance(value, Dual):
+        return protected_sin(value)
+
+    return Dual(protected_sin(value.value), protected_cos(value.value) * value.derivative)
+
+
+def dual_cos(value):
+
+    """
+    Cosine of a dual number (or float)
+
+    :param value: argument
+
+    :return: cos(value)
+    """
+
+    if not isinstance(value, Dual):
+        return protected_cos(value)
+
+    return Dual(protected_cos(value.value), -protected_sin(value.value) * value.derivative)
+
+
+def dual_exp(value):
+
+    """
+    Exponential of a dual number (or float)
+
+    :param value: argument
+
+    :return: exp(value)
+    """
+
+    if not isinstance(value, Dual):
+        return protected_exp(value)
+
+    exp_value = protected_exp(value.value)
+    return Dual(exp_value, exp_value * value.derivative)
+
+
+def dual_log(value):
+
+    """
+    Logarithm of a dual number (or float)
+
+    :param value: argument
+
+    :return: log(value)
+    """
+
+    if not isinstance(value, Dual):
+        return protected_log(value)
+
+    return Dual(protected_log(value.value), protected_division(value.derivative, value.value))
+
+
+class DualMath:
+
+    """
+    Replacement of the math module used by the decoded expressions when they are evaluated over dual numbers
+    """
+
+    sin = staticmethod(dual_sin)
+    cos = staticmethod(dual_cos)
+    exp = staticmethod(dual_exp)
+    log = staticmethod(dual_log)
+
+
+# Operators and functions of the grammar terminals that work over dual numbers (there is no power of dual numbers)
+SUPPORTED_OPERATORS = {"+", "-", "*", "/", "sin", "cos", "exp", "log"}
+
+
+def get_value_and_derivative(value):
+
+    """
+    Returns the value and the derivative of a dual number (a float is a constant, with derivative 0)
+
+    :param value: dual number or float
+
+    :return: value, derivative
+    """
+
+    if isinstance(value, Dual):
+        return value.value, value.derivative
+
+    return value, 0.0
+
+
+def compile_dual_expression(decoded_function):
+
+    """
+    Compiles a decoded expression into a function of x that works over dual numbers
+
+    :param decoded_function: decoded expression
+
+    :return: function of x
+    """
+
+    return compile_vectorized_expression(decoded_function, math_module=DualMath, division=dual_division)
+
+
+def evaluate_with_derivative(function, x):
+
+    """
+    Evaluates a compiled expression and its derivative over an array of sample points
+
+    :param function: compiled expression (see compile_dual_expression)
+    :param x: sample points
+
+    :return: array of values, array of derivatives (NaN where they are not defined)
+    """
+
+    with np.errstate(all="ignore"):
+        value, derivative = get_value_and_derivative(function(Dual(x, np.ones_like(x))))
+
+    return (np.broadcast_to(np.asarray(value, dtype=float), np.shape(x)),
+            np.broadcast_to(np.asarray(derivative, dtype=float), np.shape(x)))
@@ -0,0 +1,209 @@
+import ast
+import numpy as np
+from decode_backus_naur import decode_individual
+from GE_fitness import (get_sample_points, get_weighted_error_from_samples, get_phenotype_error_key, phenotype_errors,
+                        get_fitness_value, get_integration_constant_deviation)
+from vectorized_evaluation import protected_division, protected_sin, protected_cos, protected_exp, protected_log
+
+"""
+File that contains the evaluation of a whole population through a hash-consed DAG of expressions. Every subexpression
+shared by several individuals (or repeated inside one of them) is a single node of the DAG, so it is evaluated only
+once over the sample points
+"""
+
+BINARY_OPERATORS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+
+OPERATIONS = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": protected_division,
+    "neg": np.negative,
+    "sin": protected_sin,
+    "cos": protected_cos,
+    "exp": protected_exp,
+    "log": protected_log,
+}
+
+# Operators and functions of the grammar terminals that can be nodes of the DAG (- is also the unary minus)
+SUPPORTED_OPERATORS = set(OPERATIONS) - {"neg"}
+
+
+class ExpressionDAG:
+
+    """
+    DAG of expressions in which each node is stored once. Nodes are identified by integers and are created after
+    their children, so they can be evaluated in creation order
+    """
+
+    def __init__(self):
+
+        """
+        Creates an empty DAG
+        """
+
+        self.node_ids = {}
+        self.nodes = []
+
+    def add_node(self, node):
+
+        """
+        Returns the id of a node, creating it if it does not exist
+
+        :param node: tuple (operation, children ids...), ("x",) or ("const", value)
+
+        :return: id of the node
+        """
+
+        node_id = self.node_ids.get(node)
+
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.node_ids[node] = node_id
+            self.nodes.append(node)
+
+        return node_id
+
+    def add_expression(self, decoded_function):
+
+        """
+        Adds a decoded expression to the DAG
+
+        :param decoded_function: decoded expression
+
+        :return: id of the root node of the expression
+        """
+
+        return self.add_ast_node(ast.parse(decoded_function, mode="eval").body)
+
+    def add_ast_node(self, node):
+
+        """
+        Adds a node of the syntax tree of an expression (and its children) to the DAG
+
+        :param node: node of the syntax tree
+
+        :return: id of the node in the DAG
+        """
+
+        if isinstance(node, ast.Name):
+            return self.add_node(("x",))
+
+        elif isinstance(node, ast.Constant):
+            return self.add_node(("const", float(node.value)))
+
+        elif isinstance(node, ast.BinOp):
+            return self.add_node((BINARY_OPERATORS[type(node.op)], self.add_ast_node(node.left),
+                                  self.add_ast_node(node.right)))
+
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return self.add_node(("neg", self.add_ast_node(node.operand)))
+
+        elif isinstance(node, ast.Call):
+            return self.add_node((node.func.attr, self.add_ast_node(node.args[0])))
+
+        else:
+            raise Exception('Trying to evaluate an invalid expression: {}'.format(ast.unparse(node)))
+
+    def evaluate(self, x):
+
+        """
+        Evaluates every node of the DAG over the sample points
+
+        :param x: array of sample points
+
+        :return: list with the values of each node (NaN where it is not defined)
+        """
+
+        values = []
+
+        with np.errstate(all="ignore"):
+            for node in self.nodes:
+
+                if node[0] == "x":
+                    values.append(x)
+                elif node[0] == "const":
+                    values.append(node[1])
+                else:
+                    values.append(OPERATIONS[node[0]](*[values[child] for child in node[1:]]))
+
+        return values
+
+
+def evaluate_population_dag(individuals, parameters):
+
+    """
+    Evaluates a group of individuals sharing the evaluation of their common subexpressions
+
+    :param individuals: individuals to evaluate
+    :param parameters: parameters of the algorithm
+
+    :return: list of fitness values (see evaluate_individual)
+    """
+
+    decoded_functions = [decode_individual(individual, parameters) for individual in individuals]
+
+    phenotype_errors_found = evaluate_phenotypes_dag([decoded_function for decoded_function, correctly_decoded
+                                                      in decoded_functions if correctly_decoded], parameters)
+
+    fitnesses = []
+    for individual, (decoded_function, correctly_decoded) in zip(individuals, decoded_functions):
+
+        if not correctly_decoded:
+            fitnesses.append(get_fitness_value(individual, (None, None), parameters))
+        else:
+            fitnesses.append(get_fitness_value(individual, phenotype_errors_found[decoded_function], parameters))
+
+    return fitnesses
+
+
+def evaluate_phenotypes_dag(decoded_functions, parameters):
+
+    """
+    Computes the approximation errors of a group of decoded expressions sharing the evaluation of their common
+    subexpressions. The error of each new expression is stored in the cache of approximation errors
+
+    :param decoded_functions: decoded expressions
+    :param parameters: parameters of the algorithm
+
+    :return: dictionary decoded expression -> (approximation error, |F^(0) - F_0|) (see get_phenotype_error)
+    """
+
+    dag = ExpressionDAG()
+    root_ids = {}
+    phenotype_errors_found = {}
+
+    for decoded_function in decoded_functions:
+
+        if decoded_function in root_ids or decoded_function in phenotype_errors_found:
+            continue
+
+        phenotype_error = phenotype_errors.get(get_phenotype_error_key(decoded_function, parameters, "dag"))
+
+        if phenotype_error is None:
+            root_ids[decoded_function] = dag.add_expression(decoded_function)
+        else:
+            phenotype_errors_found[decoded_function] = phenotype_error
+
+    # The sample grid and the x+h grid are evaluated at once
+    x = get_sample_points(parameters)
+    n_of_points = len(x)
+    values = dag.evaluate(np.concatenate((x, x + parameters.h)))
+
+    phenotype_errors.max_size = parameters.fitness_cache_size
+
+    for decoded_function, root_id in root_ids.items():
+
+        Fhat = np.broadcast_to(np.asarray(values[root_id], dtype=float), (2 * n_of_points,))
+        sum, correctly_evaluated = get_weighted_error_from_samples(Fhat[:n_of_points], Fhat[n_of_points:], parameters)
+
+        if not correctly_evaluated or np.isnan(sum) or sum > parameters.fitness_for_invalid_individuals:
+            phenotype_error = None, None
+        else:
+            hx = get_integration_constant_deviation(decoded_function, parameters)
+            phenotype_error = (None, None) if hx is None else (sum / (parameters.N + 1), hx)
+
+        phenotype_errors_found[decoded_function] = phenotype_error
+        phenotype_errors.put(get_phenotype_error_key(decoded_function, parameters, "dag"), phenotype_error)
+
+    return phenotype_errors_found
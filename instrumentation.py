@@ -0,0 +1,182 @@
+import time
+import json
+import csv
+from contextlib import nullcontext
+
+"""
+File that contains the instrumentation of the GA: wall time spent on each phase of a generation and counters of the
+work done (decodes, evaluations, invalid individuals, wrappings, cache hits), recorded generation by generation
+"""
+
+
+class NullInstrumentation:
+
+    """
+    Instrumentation that records nothing, used when parameters.instrumentation is disabled
+    """
+
+    enabled = False
+    records = []
+
+    def phase(self, name):
+        return NULL_PHASE
+
+    def count(self, name, value=1):
+        pass
+
+    def watch_cache(self, name, cache):
+        pass
+
+    def end_generation(self, generation):
+        pass
+
+    def export(self, file_path):
+        pass
+
+
+class Instrumentation:
+
+    """
+    Records the wall time of each phase and the counters of each generation
+    """
+
+    enabled = True
+
+    def __init__(self, records=()):
+
+        """
+        Creates an instrumentation
+
+        :param records: records of the generations already run (to continue a resumed run)
+        """
+
+        self.records = list(records)
+        self.times = {}
+        self.counters = {}
+        self.caches = {}
+        self.generation_start = time.perf_counter()
+
+    def phase(self, name):
+
+        """
+        Returns a context manager that adds the wall time of its block to the phase name of the current generation
+
+        :param name: name of the phase
+
+        :return: context manager
+        """
+
+        return Phase(self.times, name)
+
+    def count(self, name, value=1):
+
+        """
+        Adds value to the counter name of the current generation
+
+        :param name: name of the counter
+        :param value: value to add
+
+        :return:
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def watch_cache(self, name, cache):
+
+        """
+        Records the hits and misses of a cache (see caching.LRUCache) in each generation
+
+        :param name: name of the cache
+        :param cache: cache
+
+        :return:
+        """
+
+        self.caches[name] = (cache, cache.hits, cache.misses)
+
+    def end_generation(self, generation):
+
+        """
+        Stores the times and counters of the current generation and starts a new one
+
+        :param generation: current generation
+
+        :return:
+        """
+
+        now = time.perf_counter()
+
+        for name, (cache, hits, misses) in self.caches.items():
+            self.counters[f"{name}_hits"] = cache.hits - hits
+            self.counters[f"{name}_misses"] = cache.misses - misses
+            self.caches[name] = (cache, cache.hits, cache.misses)
+
+        record = {"generation": generation, "time_total": now - self.generation_start}
+        record.update({f"time_{name}": value for name, value in self.times.items()})
+        record.update(self.counters)
+
+        self.records.append(record)
+
+        self.times = {}
+        self.counters = {}
+        self.generation_start = now
+
+    def export(self, file_path):
+
+        """
+        Writes the records to a CSV or JSON file (depending on its extension)
+
+        :param file_path: path of the file
+
+        :return:
+        """
+
+        if file_path.endswith(".json"):
+            with open(file_path, "w") as file:
+                json.dump(self.records, file, indent=1)
+
+        else:
+            fieldnames = list(dict.fromkeys(name for record in self.records for name in record))
+
+            with open(file_path, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=fieldnames, restval=0)
+                writer.writeheader()
+                writer.writerows(self.records)
+
+
+class Phase:
+
+    """
+    Context manager that measures the wall time of a phase
+    """
+
+    def __init__(self, times, name):
+        self.times = times
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.times[self.name] = self.times.get(self.name, 0) + time.perf_counter() - self.start
+
+
+NULL_PHASE = nullcontext()
+
+
+def get_instrumentation(parameters):
+
+    """
+    Returns the instrumentation selected by parameters.instrumentation, continuing the records of
+    parameters.generation_statistics (the ones stored in the checkpoint of a resumed run)
+
+    :param parameters: parameters of the algorithm
+
+    :return: Instrumentation if enabled; NullInstrumentation otherwise
+    """
+
+    if parameters.instrumentation:
+        return Instrumentation(parameters.generation_statistics)
+
+    return NullInstrumentation()
@@ -0,0 +1,353 @@
+import os
+import copy
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+from deap import creator, tools
+from GE import (create_GA_classes, setup_algorithm, create_individual_classes, create_instrumentation, initialize_GA,
+                GA_step, GAState)
+from GE_fitness import rescore_individuals
+from GA_operators import unpack_individuals
+from checkpoint import get_checkpoint, restore_checkpoint
+from decode_backus_naur import decode_individual
+from log_writer import open_log_writer, iterate_log, CSVLogWriter, BinaryLogWriter, LOG_COLUMNS
+from parallel_evaluation import PopulationExecutor, initialize_worker
+
+"""
+File that contains the island model: parameters.n_islands populations evolve in separate processes with the usual
+operators of the GA, and every parameters.migration_interval generations the best individuals of each island migrate
+to other islands (following parameters.migration_topology), replacing their worst individuals
+"""
+
+# How the curves of the islands are combined in the log of the whole execution
+LOG_COMBINATIONS = {
+    "min_fitness": min,
+    "min_genotype_len": min,
+    "max_genotype_len": max,
+}
+
+
+def get_island_log_file(log_file, island_idx):
+
+    """
+    Returns the path of the log file of an island
+
+    :param log_file: path of the log file of the execution
+    :param island_idx: index of the island
+
+    :return: path of the log file of the island
+    """
+
+    name, extension = os.path.splitext(log_file)
+    return f"{name}_island_{island_idx}{extension}"
+
+
+def create_island_toolbox(parameters):
+
+    """
+    Creates the toolbox used inside an island (evaluations are run in the process of the island)
+
+    :param parameters: parameters of the island
+
+    :return: toolbox
+    """
+
+    toolbox = setup_algorithm(parameters, create_GA_classes(parameters))
+    toolbox.register("map", PopulationExecutor(parameters).map)
+
+    return toolbox
+
+
+def initialize_island(parameters, seed):
+
+    """
+    Creates and evaluates the initial population of an island
+
+    :param parameters: parameters of the island
+    :param seed: seed of the random number generators of the island
+
+    :return: checkpoint of the island (see checkpoint.get_checkpoint)
+    """
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    toolbox = create_island_toolbox(parameters)
+    log_writer = open_log_writer(parameters)
+
+    state = initialize_GA(parameters, toolbox, create_instrumentation(parameters), log_writer, verbose=False)
+
+    parameters.log_file_position = log_writer.tell()
+    log_writer.close()
+
+    return get_checkpoint(state.population, state.generation, state.number_of_evaluations, state.success, parameters)
+
+
+def run_island_epoch(checkpoint, last_generation, immigrants):
+
+    """
+    Receives the immigrants of an island and runs its generations until last_generation (or until a successful
+    individual is found)
+
+    :param checkpoint: checkpoint of the island (see checkpoint.get_checkpoint)
+    :param last_generation: generation at which the epoch ends
+    :param immigrants: individuals received from other islands
+
+    :return: (checkpoint of the island, emigrants (its best parameters.n_migrants individuals))
+    """
+
+    create_individual_classes()
+
+    population, generation, number_of_evaluations, success, parameters = restore_checkpoint(checkpoint,
+                                                                                            creator.Individual)
+    toolbox = create_island_toolbox(parameters)
+
+    insert_immigrants(population, immigrants, parameters)
+    state = GAState(population, generation, number_of_evaluations, success)
+
+    instrumentation = create_instrumentation(parameters)
+    log_writer = open_log_writer(parameters)
+
+    try:
+        while state.generation < last_generation and not state.success:
+            GA_step(state, parameters, toolbox, instrumentation, log_writer, verbose=False)
+
+        parameters.log_file_position = log_writer.tell()
+
+    finally:
+        log_writer.close()
+
+    emigrants = [toolbox.clone(individual) for individual in tools.selBest(state.population, k=parameters.n_migrants)]
+
+    checkpoint = get_checkpoint(state.population, state.generation, state.number_of_evaluations, state.success,
+                                parameters)
+
+    return checkpoint, emigrants
+
+
+def get_best_individual(checkpoint):
+
+    """
+    Returns the best individual stored in the checkpoint of an island (without restoring the rest of the island)
+
+    :param checkpoint: checkpoint of the island (see checkpoint.get_checkpoint)
+
+    :return: best individual (with its fitness value)
+    """
+
+    best_individual_idx = int(np.argmin(checkpoint["fitness_values"]))
+    start, end = checkpoint["offsets"][best_individual_idx], checkpoint["offsets"][best_individual_idx + 1]
+
+    best_individual = creator.Individual(checkpoint["codons"][start:end].tobytes())
+    best_individual.fitness.values = float(checkpoint["fitness_values"][best_individual_idx]),
+
+    return best_individual
+
+
+def get_final_best_individual(checkpoints, parameters):
+
+    """
+    Returns the best individual of the final populations of the islands. Each island adapts its own lambdas, so the
+    fitness values of every island are first recomputed from their components with the strictest of the current
+    lambdas of the islands (see rescore_individuals), putting them on the same scale. With a single island this is
+    the best individual of its final population, as in a run without islands
+
+    :param checkpoints: checkpoints of the islands after the last generation
+    :param parameters: parameters of the algorithm
+
+    :return: best individual (with its recomputed fitness value)
+    """
+
+    individuals = []
+    for checkpoint in checkpoints:
+        population = unpack_individuals(checkpoint["codons"], checkpoint["offsets"], creator.Individual)
+
+        for individual, fitness_components in zip(population, checkpoint["fitness_components"]):
+            individual.fitness_components = fitness_components
+
+        individuals.extend(population)
+
+    scoring_parameters = copy.copy(parameters)
+    scoring_parameters.lambda_genotype_len = max(checkpoint["parameters"].lambda_genotype_len
+                                                 for checkpoint in checkpoints)
+    scoring_parameters.lambda_integration_const = max(checkpoint["parameters"].lambda_integration_const
+                                                      for checkpoint in checkpoints)
+
+    fitness_values = rescore_individuals(individuals, scoring_parameters)
+
+    return individuals[int(np.argmin(fitness_values))]
+
+
+def insert_immigrants(population, immigrants, parameters):
+
+    """
+    Replaces the worst individuals of the population with the immigrants. The fitness values of the immigrants are
+    recombined from their components with the lambdas of the island (see rescore_individuals)
+
+    :param population: population of the island
+    :param immigrants: individuals received from other islands
+    :param parameters: parameters of the island
+
+    :return:
+    """
+
+    if not immigrants:
+        return
+
+    rescore_individuals(immigrants, parameters)
+
+    worst_individual_idxs = np.argsort([-individual.fitness.values[0] for individual in population], kind="stable")
+
+    for individual_idx, immigrant in zip(worst_individual_idxs, immigrants):
+        population[individual_idx] = immigrant
+
+
+def get_migration_targets(n_of_islands, topology, rng):
+
+    """
+    Returns the islands that receive the emigrants of each island
+
+    :param n_of_islands: number of islands
+    :param topology: ring (to the next island), fully_connected (to every other island) or random (to another island
+                     chosen at random in each migration)
+    :param rng: random number generator used by the random topology
+
+    :return: list with the target islands of each island
+    """
+
+    if n_of_islands <= 1:
+        return [[] for _ in range(n_of_islands)]
+
+    if topology == "ring":
+        return [[(island_idx + 1) % n_of_islands] for island_idx in range(n_of_islands)]
+
+    elif topology == "fully_connected":
+        return [[target_idx for target_idx in range(n_of_islands) if target_idx != island_idx]
+                for island_idx in range(n_of_islands)]
+
+    elif topology == "random":
+        return [[(island_idx + int(rng.integers(1, n_of_islands))) % n_of_islands]
+                for island_idx in range(n_of_islands)]
+
+    else:
+        raise Exception('Invalid migration topology: {}'.format(topology))
+
+
+def merge_island_logs(island_log_files, parameters):
+
+    """
+    Writes the log of the whole execution combining the logs of the islands generation by generation: minimum of the
+    minimum values, maximum of the maximum values and mean of the rest (see LOG_COMBINATIONS)
+
+    :param island_log_files: log file of each island
+    :param parameters: parameters of the execution
+
+    :return:
+    """
+
+    writer_class = CSVLogWriter if parameters.log_file.endswith(".csv") else BinaryLogWriter
+    island_logs = [iterate_log(log_file) for log_file in island_log_files]
+
+    with writer_class(parameters.log_file, LOG_COLUMNS, parameters.log_buffer_size) as log_writer:
+        while True:
+            records = [record for record in (next(island_log, None) for island_log in island_logs) if record is not None]
+
+            if not records:
+                break
+
+            record = {column: LOG_COMBINATIONS.get(column, np.mean)([record[column] for record in records])
+                      for column in LOG_COLUMNS}
+            record["generation"] = int(records[0]["generation"])
+
+            log_writer.write(record)
+
+
+def run_island_model(parameters, seed, verbose=True):
+
+    """
+    Runs the GE with the island model, each island in its own process
+
+    :param parameters: parameters of the algorithm (the population of each island has parameters.population_length
+                       individuals)
+    :param seed: seed of the execution (the seed of each island is derived from it)
+    :param verbose: whether to print logs
+
+    :return: (parameters, success, fitness value of the best individual of the final populations (see
+             get_final_best_individual), number of evaluations of all the islands). parameters.island_parameters
+             contains the parameters (and logs) of each island and parameters.best_so_far the generation and the
+             global best fitness value found after each migration (with the lambdas of its island at that moment)
+    """
+
+    island_seeds = [int(seed_sequence.generate_state(1)[0])
+                    for seed_sequence in np.random.SeedSequence(seed).spawn(parameters.n_islands + 1)]
+    migration_rng = np.random.default_rng(island_seeds.pop())
+
+    island_parameters = []
+    for island_idx in range(parameters.n_islands):
+
+        # Islands run in their own process, so they evaluate serially
+        island_parameter = copy.deepcopy(parameters)
+        island_parameter.executor = "serial"
+        island_parameter.instrumentation = False
+        island_parameter.checkpoint_file = None
+        island_parameter.log_file_position = None
+
+        if parameters.log_file is not None:
+            island_parameter.log_file = get_island_log_file(parameters.log_file, island_idx)
+
+        island_parameters.append(island_parameter)
+
+    create_individual_classes()
+    parameters.best_so_far = []
+
+    with ProcessPoolExecutor(max_workers=parameters.n_islands, initializer=initialize_worker) as executor:
+
+        checkpoints = list(executor.map(initialize_island, island_parameters, island_seeds))
+        immigrants = [[] for _ in range(parameters.n_islands)]
+
+        best_individual = min((get_best_individual(checkpoint) for checkpoint in checkpoints),
+                              key=lambda individual: individual.fitness.values[0])
+
+        generation = 0
+
+        while generation < parameters.max_gens and not any(checkpoint["success"] for checkpoint in checkpoints):
+
+            generation = min(generation + parameters.migration_interval, parameters.max_gens)
+
+            results = list(executor.map(run_island_epoch, checkpoints, repeat(generation), immigrants))
+            checkpoints = [checkpoint for checkpoint, _ in results]
+
+            # Migration
+            immigrants = [[] for _ in range(parameters.n_islands)]
+            targets = get_migration_targets(parameters.n_islands, parameters.migration_topology, migration_rng)
+
+            for island_idx, (_, emigrants) in enumerate(results):
+                for target_idx in targets[island_idx]:
+                    immigrants[target_idx].extend(emigrants)
+
+            # Global best so far
+            for checkpoint in checkpoints:
+                island_best_individual = get_best_individual(checkpoint)
+
+                if island_best_individual.fitness.values[0] < best_individual.fitness.values[0]:
+                    best_individual = island_best_individual
+
+            parameters.best_so_far.append((generation, best_individual.fitness.values[0]))
+
+            if verbose:
+                print(f"{generation}\t{best_individual.fitness.values[0]}")
+
+    parameters.island_parameters = [checkpoint["parameters"] for checkpoint in checkpoints]
+
+    if parameters.log_file is not None:
+        merge_island_logs([island_parameter.log_file for island_parameter in island_parameters], parameters)
+
+    success = any(checkpoint["success"] for checkpoint in checkpoints)
+    number_of_evaluations = sum(checkpoint["number_of_evaluations"] for checkpoint in checkpoints)
+
+    best_individual = get_final_best_individual(checkpoints, parameters)
+
+    print(f"Best individual: {decode_individual(best_individual, parameters)[0]}, fitness value: {best_individual.fitness.values[0]}")
+
+    return parameters, success, best_individual.fitness.values[0], number_of_evaluations
@@ -1,4 +1,8 @@
-from decode_backus_naur import get_non_terminal_indexes
+from decode_backus_naur import (derive_individual, get_terminal_codon_indexes, derive_neighbor, tokens_to_expression,
+                                decode_individual)
+from parallel_evaluation import evaluate_phenotypes
+from GE_fitness import set_fitness, get_fitness_value
+from simplification import simplify_phenotype
 import numpy as np
 
 """
@@ -6,22 +10,76 @@ File where local search operator is implemented
 """
 
 
-def local_search(individual, parameters, toolbox):
+def local_search_population(individuals, parameters, toolbox):
 
     """
-    Local search operator. Performs a local search on the provided individual
+    Local search operator applied to a group of individuals. The neighborhoods of all of them are built first (reusing
+    the derivation of each individual) and the different expressions they contain are evaluated in a single batch
 
-    :param individual: individual
+    :param individuals: individuals
     :param parameters: parameters of the algorithm
     :param toolbox: toolbox of the algorith (deap object)
 
-    :return: new individual
+    :return: new individuals, number of evaluations
     """
 
     n_of_evaluations = 0
+
+    neighborhoods = [get_neighborhood(individual, parameters) for individual in individuals]
+
+    phenotype_errors = evaluate_phenotypes([decoded_function for neighborhood in neighborhoods
+                                            for _, _, decoded_function in neighborhood if decoded_function is not None],
+                                           parameters, toolbox)
+
+    new_individuals = []
+    for individual, neighborhood in zip(individuals, neighborhoods):
+
+        if len(neighborhood) == 0:
+            new_individuals.append(toolbox.clone(individual))
+            continue
+
+        # Neighbors have the same length as the individual, so the genotype length penalty is the same
+        neighborhood_evaluations = [get_fitness_value(individual, phenotype_errors.get(decoded_function, (None, None)),
+                                                      parameters) for _, _, decoded_function in neighborhood]
+        neighborhood_fitnesses = [fitness[0] for fitness in neighborhood_evaluations]
+        n_of_evaluations += len(neighborhood)
+
+        if not(individual.fitness.values[0] <= min(neighborhood_fitnesses)):
+            best_neighbor_idx = np.argmin(neighborhood_fitnesses)
+            codon_idx, new_codon, _ = neighborhood[best_neighbor_idx]
+
+            individual_to_return = toolbox.clone(individual)
+            individual_to_return[codon_idx] = new_codon
+            set_fitness(individual_to_return, neighborhood_evaluations[best_neighbor_idx], parameters)
+
+            new_individuals.append(individual_to_return)
+        else:
+            new_individuals.append(toolbox.clone(individual))
+
+    return new_individuals, n_of_evaluations
+
+
+def get_neighborhood(individual, parameters):
+
+    """
+    Builds the neighborhood of an individual: the individuals obtained adding 1, 2 or 3 to one of its last terminal
+    codons. Their expressions are obtained replacing the tokens selected by the changed codon in the derivation of
+    the individual, and decoding them again only if the codon also selects a non-terminal (because of wrapping)
+
+    :param individual: individual
+    :param parameters: parameters of the algorithm
+
+    :return: list of neighbors (codon index, new codon, decoded expression (None if not correctly decoded)); empty if
+             the local search is not applied to the individual
+    """
+
+    neighborhood = []
+
     if np.random.random() <= parameters.local_search_prob:
 
-        terminal_idxs, correctly_decoded = get_non_terminal_indexes(individual, parameters)
+        tokens, codon_uses, n_wrapping, correctly_decoded = derive_individual(individual, parameters,
+                                                                              record_codon_uses=True)
+        terminal_idxs = list(set(get_terminal_codon_indexes(codon_uses, parameters)))
 
         if len(terminal_idxs) > 0:
             if correctly_decoded:
@@ -29,19 +87,24 @@ def local_search(individual, parameters, toolbox):
 
                 idxs_to_vary = terminal_idxs[-n_codons_to_modify:]
 
-                neighborhood = []
                 for idx in idxs_to_vary:
                     for i in range(1, 4):
-                        neighbor = toolbox.clone(individual)
-                        neighbor[idx] += i
-                        neighborhood.append(neighbor)
+                        new_codon = (individual[idx] + i) % 256
+                        neighbor_tokens = derive_neighbor(tokens, codon_uses, idx, new_codon, parameters)
+
+                        if neighbor_tokens is not None:
+                            # Same derivation structure, so same number of wrappings
+                            parameters.wrappings_by_individual.append(n_wrapping)
+                            decoded_function = simplify_phenotype(tokens_to_expression(neighbor_tokens, parameters),
+                                                                  parameters)
+                        else:
+                            neighbor = individual[:]
+                            neighbor[idx] = new_codon
+                            decoded_function, neighbor_correctly_decoded = decode_individual(neighbor, parameters)
 
-                neighborhood_fitnesses = [toolbox.evaluate(individual)[0] for individual in neighborhood]
-                n_of_evaluations += len(neighborhood)
+                            if not neighbor_correctly_decoded:
+                                decoded_function = None
 
-                if not(individual.fitness.values[0] <= min(neighborhood_fitnesses)):
-                    individual_to_return = neighborhood[np.argmin(neighborhood_fitnesses)]
-                    individual_to_return.fitness.values = min(neighborhood_fitnesses),
-                    return individual_to_return, n_of_evaluations
+                        neighborhood.append((idx, new_codon, decoded_function))
 
-    return toolbox.clone(individual), n_of_evaluations
+    return neighborhood
@@ -0,0 +1,233 @@
+import json
+import os
+import struct
+import numpy as np
+
+"""
+File that contains the writers of the per-generation logs. Each generation is appended to the log file as soon as it
+is computed (through a buffer of a few generations), so the memory used does not depend on the number of generations
+and an interrupted execution leaves the curves of the generations already run. Logs are written as CSV or in a binary
+columnar format (blocks of generations, each of them storing every column contiguously as float64)
+"""
+
+LOG_COLUMNS = ("generation", "avg_fitness", "min_fitness", "std_fitness", "avg_genotype_len", "min_genotype_len",
+               "max_genotype_len", "avg_wrapping", "std_wrapping")
+
+BINARY_LOG_MAGIC = b"GELOG\x01"
+
+
+class NullLogWriter:
+
+    """
+    Log writer that writes nothing, used when parameters.log_file is not set
+    """
+
+    def write(self, record):
+        pass
+
+    def flush(self):
+        pass
+
+    def tell(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class LogWriter:
+
+    """
+    Buffered append-only writer of a log file. Subclasses define the format of the header and of the blocks
+    """
+
+    def __init__(self, file_path, columns, buffer_size, position=None):
+
+        """
+        Opens a log file. If position is given, the file is truncated to it and the new generations are appended after
+        it (to resume an execution from a checkpoint); otherwise a new file is created
+
+        :param file_path: path of the log file
+        :param columns: names of the columns of the log
+        :param buffer_size: number of generations kept in memory before writing them
+        :param position: position of the file returned by tell (None for a new file)
+        """
+
+        self.columns = tuple(columns)
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+        if position is not None and os.path.exists(file_path):
+            self.file = open(file_path, "r+b")
+            self.file.seek(position)
+            self.file.truncate()
+
+        else:
+            self.file = open(file_path, "wb")
+            self.file.write(self.encode_header())
+            self.file.flush()
+
+    def write(self, record):
+
+        """
+        Appends the log of a generation
+
+        :param record: dictionary column -> value
+
+        :return:
+        """
+
+        self.buffer.append([record[column] for column in self.columns])
+
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+
+        """
+        Writes the buffered generations to the file
+
+        :return:
+        """
+
+        if self.buffer:
+            self.file.write(self.encode_block(self.buffer))
+            self.buffer = []
+
+        self.file.flush()
+
+    def tell(self):
+
+        """
+        Writes the buffered generations and returns the current position of the file
+
+        :return: position of the file
+        """
+
+        self.flush()
+        return self.file.tell()
+
+    def close(self):
+
+        """
+        Writes the buffered generations and closes the file
+
+        :return:
+        """
+
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CSVLogWriter(LogWriter):
+
+    """
+    Log writer of CSV files (one line per generation)
+    """
+
+    def encode_header(self):
+        return (",".join(self.columns) + "\n").encode()
+
+    def encode_block(self, rows):
+        return "".join(",".join(str(value) for value in row) + "\n" for row in rows).encode()
+
+
+class BinaryLogWriter(LogWriter):
+
+    """
+    Log writer of binary columnar files: a header with the names of the columns followed by blocks, each of them with
+    the number of generations it contains and the values of each column (float64) one after another
+    """
+
+    def encode_header(self):
+        names = json.dumps(self.columns).encode()
+        return BINARY_LOG_MAGIC + struct.pack("<I", len(names)) + names
+
+    def encode_block(self, rows):
+        return struct.pack("<I", len(rows)) + np.array(rows, dtype="<f8").T.tobytes()
+
+
+def open_log_writer(parameters, columns=LOG_COLUMNS):
+
+    """
+    Opens the log writer selected by parameters.log_file: CSV if its extension is .csv, binary columnar otherwise. If
+    parameters.log_file_position is set (the execution is resumed from a checkpoint), the log is continued from it
+
+    :param parameters: parameters of the algorithm
+    :param columns: names of the columns of the log
+
+    :return: log writer
+    """
+
+    if parameters.log_file is None:
+        return NullLogWriter()
+
+    writer_class = CSVLogWriter if parameters.log_file.endswith(".csv") else BinaryLogWriter
+
+    return writer_class(parameters.log_file, columns, parameters.log_buffer_size, parameters.log_file_position)
+
+
+def iterate_log(file_path):
+
+    """
+    Reads a log file generation by generation. A block cut by an interrupted write is ignored
+
+    :param file_path: path of the log file (CSV or binary columnar)
+
+    :return: generator of dictionaries column -> value
+    """
+
+    with open(file_path, "rb") as file:
+
+        if file.read(len(BINARY_LOG_MAGIC)) != BINARY_LOG_MAGIC:
+            file.seek(0)
+            columns = file.readline().decode().strip().split(",")
+
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+
+                yield dict(zip(columns, map(float, line.decode().split(","))))
+
+            return
+
+        names_length, = struct.unpack("<I", file.read(4))
+        columns = json.loads(file.read(names_length))
+
+        while True:
+            block_header = file.read(4)
+            if len(block_header) < 4:
+                break
+
+            n_of_rows, = struct.unpack("<I", block_header)
+            data = file.read(8 * n_of_rows * len(columns))
+            if len(data) < 8 * n_of_rows * len(columns):
+                break
+
+            for row in np.frombuffer(data, dtype="<f8").reshape(len(columns), n_of_rows).T.tolist():
+                yield dict(zip(columns, row))
+
+
+def read_log(file_path):
+
+    """
+    Reads a whole log file
+
+    :param file_path: path of the log file (CSV or binary columnar)
+
+    :return: dictionary column -> array of values (one per generation)
+    """
+
+    records = list(iterate_log(file_path))
+
+    if not records:
+        return {}
+
+    return {column: np.array([record[column] for record in records]) for column in records[0]}
@@ -1,69 +1,229 @@
-from GE import run_GE
+from GE import run_GE, resume_GE
+from island_model import run_island_model
 import numpy as np
 import random
+import copy
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from parameters import Parameters
+from log_writer import LOG_COLUMNS, iterate_log
 
 """
 File that runs the algorithm N_OF_INDEPENDENT_EXECUTIONS independent times and genrated the log
 """
 
+def run_independent_execution(parameters, seed, checkpoint_file=None, log_file=None):
+
+    """
+    Runs one independent execution of the GE with its own copy of the parameters and its own seed (with the island
+    model if parameters.n_islands > 1). If a checkpoint file is given, the execution stores its checkpoints in it, and
+    it is resumed from it if it already exists (the file is removed when the execution finishes). Checkpoints are not
+    used by the island model
+
+    :param parameters: parameters of the algorithm (they are not modified)
+    :param seed: seed of the random number generators
+    :param checkpoint_file: path of the checkpoint file of the execution (None for no checkpoints)
+    :param log_file: path of the log file of the execution (None to use parameters.log_file)
+
+    :return: (parameters after the execution, success, best individual's fitness value, number of evaluations)
+    """
+
+    if parameters.n_islands > 1:
+        execution_parameters = copy.deepcopy(parameters)
+        if log_file is not None:
+            execution_parameters.log_file = log_file
+
+        return run_island_model(execution_parameters, seed, verbose=False)
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        result = resume_GE(checkpoint_file, verbose=False)
+
+    else:
+        random.seed(seed)
+        np.random.seed(seed)
+
+        execution_parameters = copy.deepcopy(parameters)
+        execution_parameters.checkpoint_file = checkpoint_file
+        if log_file is not None:
+            execution_parameters.log_file = log_file
+
+        result = run_GE(execution_parameters, verbose=False)
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    return result
+
+
+def get_execution_seeds(random_seed, n_of_executions):
+
+    """
+    Derives the seed of each independent execution from the seed of the experiment, so each execution gives the same
+    result whatever the number of executions run in parallel is
+
+    :param random_seed: seed of the experiment
+    :param n_of_executions: number of independent executions
+
+    :return: list of seeds
+    """
+
+    return [int(seed_sequence.generate_state(1)[0]) for seed_sequence in np.random.SeedSequence(random_seed).spawn(n_of_executions)]
+
+
+def get_checkpoint_file(checkpoint_directory, execution_idx, parameters, seed, log_file):
+
+    """
+    Returns the path of the checkpoint file of an independent execution. Its name contains a digest of the
+    configuration, the seed and the log file of the execution, so a checkpoint is only resumed by the same execution
+    (a checkpoint left by an execution with other parameters is ignored)
+
+    :param checkpoint_directory: directory of the checkpoints (None for no checkpoints)
+    :param execution_idx: index of the execution
+    :param parameters: parameters of the algorithm
+    :param seed: seed of the execution
+    :param log_file: path of the log file of the execution (None to use parameters.log_file)
+
+    :return: path of the checkpoint file (None for no checkpoints)
+    """
+
+    if checkpoint_directory is None:
+        return None
+
+    execution_key = json.dumps({"parameters": parameters.get_digest(), "seed": seed,
+                                "log_file": parameters.log_file if log_file is None else log_file}, sort_keys=True)
+    digest = hashlib.sha1(execution_key.encode()).hexdigest()
+
+    return os.path.join(checkpoint_directory, f"execution_{execution_idx}_{digest}.ckpt")
+
+
+def run_independent_executions(parameters, seeds, n_of_parallel_executions, checkpoint_directory=None,
+                               log_files=None):
+
+    """
+    Runs the independent executions, in a pool of processes if n_of_parallel_executions > 1
+
+    :param parameters: parameters of the algorithm
+    :param seeds: seed of each execution
+    :param n_of_parallel_executions: number of executions run at the same time
+    :param checkpoint_directory: directory where the checkpoints of the executions are stored (None for no
+                                 checkpoints). Executions with a checkpoint in it are resumed
+    :param log_files: log file of each execution (None to use parameters.log_file)
+
+    :return: generator of (execution index, result of run_independent_execution), in the order the executions finish
+    """
+
+    if log_files is None:
+        log_files = [None for _ in seeds]
+
+    if n_of_parallel_executions <= 1:
+        for execution_idx, seed in enumerate(seeds):
+            print(f"Execution number {execution_idx}")
+            checkpoint_file = get_checkpoint_file(checkpoint_directory, execution_idx, parameters, seed,
+                                                  log_files[execution_idx])
+            yield execution_idx, run_independent_execution(parameters, seed, checkpoint_file, log_files[execution_idx])
+
+    else:
+        with ProcessPoolExecutor(max_workers=n_of_parallel_executions) as executor:
+            futures = {executor.submit(run_independent_execution, parameters, seed,
+                                       get_checkpoint_file(checkpoint_directory, execution_idx, parameters, seed,
+                                                           log_files[execution_idx]),
+                                       log_files[execution_idx]): execution_idx
+                       for execution_idx, seed in enumerate(seeds)}
+
+            for future in as_completed(futures):
+                print(f"Execution number {futures[future]} finished")
+                yield futures[future], future.result()
+
+
+def get_execution_log_file(log_directory, log_file_name, execution_idx):
+
+    """
+    Returns the path of the log file of an independent execution
+
+    :param log_directory: directory of the logs
+    :param log_file_name: name of the log file of the experiment
+    :param execution_idx: index of the execution
+
+    :return: path of the log file
+    """
+
+    name, extension = os.path.splitext(log_file_name)
+    return os.path.join(log_directory, f"{name}_execution_{execution_idx}{extension}")
+
+
+def merge_execution_logs(execution_log_files, n_of_generations, file):
+
+    """
+    Writes the mean curves of the independent executions reading their log files generation by generation, so only
+    one generation of each execution is in memory. Generations not run by an execution (because it finished before)
+    count as 0
+
+    :param execution_log_files: log file of each execution (see log_writer.py)
+    :param n_of_generations: number of generations of the curves
+    :param file: opened file where the mean curves are written
+
+    :return:
+    """
+
+    columns = LOG_COLUMNS[1:]
+    execution_logs = [iterate_log(log_file) for log_file in execution_log_files]
+
+    file.write(",".join(LOG_COLUMNS) + "\n")
+
+    for g in range(n_of_generations):
+
+        sums = [0.0 for _ in columns]
+
+        for execution_log in execution_logs:
+            record = next(execution_log, None)
+
+            if record is not None:
+                sums = [value + record[column] for value, column in zip(sums, columns)]
+
+        file.write(",".join([str(g)] + [str(value / len(execution_log_files)) for value in sums]) + "\n")
+
+
 def main():
 
     LOG_FILE_NAME = "problem_6.csv"
+    LOG_DIRECTORY = "../log"
     RANDOM_SEED = 42
     N_OF_INDEPENDENT_EXECUTIONS = 30
-    random.seed(RANDOM_SEED)
-    np.random.seed(RANDOM_SEED)
+    CHECKPOINT_DIRECTORY = "../checkpoints"
 
     number_of_successes = 0
-    VAMs = []
-    n_of_evaluations = []
+    VAMs = [0 for _ in range(N_OF_INDEPENDENT_EXECUTIONS)]
+    n_of_evaluations = [None for _ in range(N_OF_INDEPENDENT_EXECUTIONS)]
 
-    # Initializates parameters
+    # Initializates parameters. Curves are streamed to a log file per execution instead of being kept in memory
     parameters = Parameters()
+    parameters.keep_logs_in_memory = False
+
+    # Each execution with the island model already uses n_islands processes
+    N_OF_PARALLEL_EXECUTIONS = max(1, os.cpu_count() // parameters.n_islands)
 
-    # Initialized log lists
-    avg_fitness_progress_curve = np.zeros((1, parameters.max_gens+1))
-    min_fitness_progress_curve = np.zeros((1, parameters.max_gens+1))
-    std_fitness_progress_curve = np.zeros((1, parameters.max_gens+1))
+    execution_log_files = [get_execution_log_file(LOG_DIRECTORY, LOG_FILE_NAME, execution_idx)
+                           for execution_idx in range(N_OF_INDEPENDENT_EXECUTIONS)]
 
-    avg_length_progress_curve = np.zeros((1, parameters.max_gens+1))
-    min_length_progress_curve = np.zeros((1, parameters.max_gens+1))
-    max_length_progress_curve = np.zeros((1, parameters.max_gens+1))
+    seeds = get_execution_seeds(RANDOM_SEED, N_OF_INDEPENDENT_EXECUTIONS)
 
-    avg_wrapping_progress_curve = np.zeros((1, parameters.max_gens+1))
-    std_wrapping_progress_curve = np.zeros((1, parameters.max_gens+1))
+    os.makedirs(LOG_DIRECTORY, exist_ok=True)
+    os.makedirs(CHECKPOINT_DIRECTORY, exist_ok=True)
 
-    for _ in range(N_OF_INDEPENDENT_EXECUTIONS):
+    for execution_idx, result in run_independent_executions(parameters, seeds, N_OF_PARALLEL_EXECUTIONS,
+                                                            CHECKPOINT_DIRECTORY, execution_log_files):
 
-        print(f"Execution number {_}")
-        parameters, success, best_individuals_fitness_value, number_of_evaluations = run_GE(parameters, verbose=False)
+        execution_parameters, success, best_individuals_fitness_value, number_of_evaluations = result
 
         if success:
             number_of_successes += 1
-            n_of_evaluations.append(number_of_evaluations)
-
-        VAMs.append(best_individuals_fitness_value)
-
-        avg_fitness_progress_curve = np.sum((avg_fitness_progress_curve,
-                                             np.array(parameters.avg_fitnesses).reshape(1, parameters.max_gens+1)), axis=0)
-        min_fitness_progress_curve = np.sum((min_fitness_progress_curve,
-                                             np.array(parameters.min_fitnesses).reshape(1, parameters.max_gens+1)), axis=0)
-        std_fitness_progress_curve = np.sum((std_fitness_progress_curve,
-                                             np.array(parameters.sd_fitnesses).reshape(1, parameters.max_gens+1)), axis=0)
+            n_of_evaluations[execution_idx] = number_of_evaluations
 
-        avg_length_progress_curve = np.sum((avg_length_progress_curve,
-                                            np.array(parameters.avg_lens).reshape(1, parameters.max_gens+1)), axis=0)
-        min_length_progress_curve = np.sum((min_length_progress_curve,
-                                            np.array(parameters.min_lens).reshape(1, parameters.max_gens+1)), axis=0)
-        max_length_progress_curve = np.sum((max_length_progress_curve,
-                                            np.array(parameters.max_lens).reshape(1, parameters.max_gens+1)), axis=0)
-
-        avg_wrapping_progress_curve = np.sum((avg_wrapping_progress_curve,
-                                              np.array(parameters.avg_wrapping).reshape(1, parameters.max_gens+1)), axis=0)
-        std_wrapping_progress_curve = np.sum((std_wrapping_progress_curve,
-                                              np.array(parameters.sd_wrapping).reshape(1, parameters.max_gens+1)), axis=0)
+        VAMs[execution_idx] = best_individuals_fitness_value
 
+    n_of_evaluations = [evaluations for evaluations in n_of_evaluations if evaluations is not None]
 
     TE = 100.0 * number_of_successes / N_OF_INDEPENDENT_EXECUTIONS
     VAMM = np.mean(VAMs)
@@ -74,21 +234,10 @@ def main():
 
     print(f"Generating log file: {LOG_FILE_NAME}")
 
-    avg_fitness_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-    min_fitness_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-    std_fitness_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-    avg_length_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-    min_length_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-    max_length_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-    avg_wrapping_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-    std_wrapping_progress_curve /= N_OF_INDEPENDENT_EXECUTIONS
-
-    with open(f"../log/{LOG_FILE_NAME}", 'w') as file:
-
-        file.write("generation,avg_fitness,min_fitness,std_fitness,avg_genotype_len,min_genotype_len,max_genotype_len,avg_wrapping,std_wrapping\n")
+    # Curves are merged in the order of the executions, whatever the order in which they finished is
+    with open(os.path.join(LOG_DIRECTORY, LOG_FILE_NAME), 'w') as file:
 
-        for g in range(avg_fitness_progress_curve.shape[1]):
-            file.write(f"{g},{avg_fitness_progress_curve[0, g]},{min_fitness_progress_curve[0, g]},{std_fitness_progress_curve[0, g]},{avg_length_progress_curve[0, g]},{min_length_progress_curve[0, g]},{max_length_progress_curve[0, g]},{avg_wrapping_progress_curve[0, g]},{std_wrapping_progress_curve[0, g]}\n")
+        merge_execution_logs(execution_log_files, parameters.max_gens + 1, file)
 
         file.write(f"#TE: {TE}\n")
         file.write(f"#VAMM: {VAMM}\n")
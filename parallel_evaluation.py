@@ -0,0 +1,208 @@
+import math
+import heapq
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from expression_dag import evaluate_population_dag, evaluate_phenotypes_dag
+from GE_fitness import get_phenotype_error, evaluate_individual_bounded
+
+"""
+File that contains the executors used to evaluate groups of individuals (serially, with threads or with processes)
+"""
+
+
+class PopulationExecutor:
+
+    """
+    Executor registered as the map function of the toolbox. Work is dispatched in chunks, so every worker receives
+    several chunks of each population
+    """
+
+    def __init__(self, parameters):
+
+        """
+        Creates the pool of workers corresponding to parameters.executor
+
+        :param parameters: parameters of the algorithm
+        """
+
+        self.method = parameters.executor
+        self.n_workers = parameters.n_workers
+        self.chunks_per_worker = parameters.chunks_per_worker
+
+        if self.method == "serial":
+            self.pool = None
+        elif self.method == "thread":
+            self.pool = ThreadPoolExecutor(max_workers=self.n_workers)
+        elif self.method == "process":
+            self.pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=initialize_worker)
+        else:
+            raise Exception('Invalid executor: {}'.format(self.method))
+
+    def map(self, function, *iterables):
+
+        """
+        Applies function to the items of the iterables
+
+        :param function: function to apply
+        :param iterables: arguments of the function
+
+        :return: list of results (in the same order as the arguments)
+        """
+
+        if self.pool is None:
+            return list(map(function, *iterables))
+
+        arguments = [list(iterable) for iterable in iterables]
+        chunksize = max(1, math.ceil(len(arguments[0]) / (self.n_workers * self.chunks_per_worker)))
+
+        return list(self.pool.map(function, *arguments, chunksize=chunksize))
+
+    def shutdown(self):
+
+        """
+        Stops the workers of the pool
+
+        :return:
+        """
+
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+def initialize_worker():
+
+    """
+    Initializes a worker process, creating the DEAP classes needed to receive individuals
+
+    :return:
+    """
+
+    from GE import create_individual_classes
+    create_individual_classes()
+
+
+def evaluate_individuals(individuals, parameters, toolbox):
+
+    """
+    Evaluates a group of individuals with the map function of the toolbox. The wrappings logged and the decodes
+    counted by each evaluation are returned by the workers and merged into parameters, so logs are correct whatever
+    the executor is. If parameters.population_evaluation is "dag", the group is evaluated at once sharing its common
+    subexpressions
+
+    :param individuals: individuals to evaluate
+    :param parameters: parameters of the algorithm
+    :param toolbox: toolbox of the algorithm
+
+    :return: list of fitness values (see evaluate_individual)
+    """
+
+    if parameters.population_evaluation == "dag":
+        return evaluate_population_dag(individuals, parameters)
+
+    evaluation_parameters = parameters.copy_for_evaluation()
+    results = toolbox.map(toolbox.evaluate_in_isolation, individuals, repeat(evaluation_parameters, len(individuals)))
+
+    fitnesses = []
+    for fitness, wrappings, n_of_decodes in results:
+        fitnesses.append(fitness)
+        parameters.wrappings_by_individual.extend(wrappings)
+        parameters.n_of_decodes += n_of_decodes
+
+    return fitnesses
+
+
+def evaluate_offspring_bounded(offspring, population, parameters):
+
+    """
+    Evaluates the offspring racing against the survival selection: each individual is evaluated only until its
+    fitness value is known to be worse than the one it needs to survive (see get_survival_cutoff). The offspring are
+    evaluated one after another in this process, as the cutoff improves with each exact evaluation
+
+    :param offspring: offspring to evaluate
+    :param population: current population (already evaluated)
+    :param parameters: parameters of the algorithm
+
+    :return: list of fitness values (see evaluate_individual_bounded)
+    """
+
+    if parameters.survival_selection_method == "mu_plus_lambda":
+        n_of_survivors = parameters.population_length
+        competitors = [individual.fitness.values[0] for individual in population]
+    elif parameters.survival_selection_method == "steady_state_model":
+        n_of_survivors = parameters.population_length // 2
+        competitors = []
+    else:
+        n_of_survivors = len(offspring)
+        competitors = []
+
+    # Max-heap (with negated values) of the best n_of_survivors exact fitness values found
+    best_fitnesses = [-fitness for fitness in heapq.nsmallest(n_of_survivors, competitors)]
+    heapq.heapify(best_fitnesses)
+
+    fitnesses = []
+    for individual in offspring:
+
+        cutoff = get_survival_cutoff(best_fitnesses, n_of_survivors)
+        fitness = evaluate_individual_bounded(individual, parameters, cutoff)
+        fitnesses.append(fitness)
+
+        fitness_value, _, _, partial = fitness
+
+        if not partial and not math.isnan(fitness_value):
+            if len(best_fitnesses) < n_of_survivors:
+                heapq.heappush(best_fitnesses, -fitness_value)
+            elif fitness_value < -best_fitnesses[0]:
+                heapq.heapreplace(best_fitnesses, -fitness_value)
+
+    return fitnesses
+
+
+def get_survival_cutoff(best_fitnesses, n_of_survivors):
+
+    """
+    Returns the fitness value above which an individual can not survive: the worst of the n_of_survivors best exact
+    fitness values found (an individual worse than it has n_of_survivors better competitors)
+
+    :param best_fitnesses: max-heap of the best exact fitness values (negated)
+    :param n_of_survivors: number of survivors
+
+    :return: cutoff (inf while there are less than n_of_survivors competitors)
+    """
+
+    if len(best_fitnesses) < n_of_survivors:
+        return math.inf
+
+    return -best_fitnesses[0]
+
+
+def evaluate_phenotypes(decoded_functions, parameters, toolbox):
+
+    """
+    Computes the approximation errors of a group of decoded expressions, each of them only once. They are evaluated
+    at once through a DAG if parameters.population_evaluation is "dag", or with the map function of the toolbox
+    otherwise
+
+    :param decoded_functions: decoded expressions
+    :param parameters: parameters of the algorithm
+    :param toolbox: toolbox of the algorithm
+
+    :return: dictionary decoded expression -> (approximation error, |F^(0) - F_0|) (see get_phenotype_error)
+    """
+
+    unique_decoded_functions = list(dict.fromkeys(decoded_functions))
+
+    if parameters.population_evaluation == "dag":
+        return evaluate_phenotypes_dag(unique_decoded_functions, parameters)
+
+    evaluation_parameters = parameters.copy_for_evaluation()
+    phenotype_errors = toolbox.map(get_phenotype_error, unique_decoded_functions,
+                                   repeat(evaluation_parameters, len(unique_decoded_functions)))
+
+    return dict(zip(unique_decoded_functions, phenotype_errors))
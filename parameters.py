@@ -1,4 +1,17 @@
 import numpy as np
+import copy
+import hashlib
+import json
+import os
+from problems import get_problem
+
+# Attributes that hold the state or the logs of a run, or that only change how it is run (not its result). They are
+# left out of the digest of the parameters (see Parameters.get_digest)
+RUN_ATTRIBUTES = ("avg_fitnesses", "min_fitnesses", "sd_fitnesses", "min_lens", "max_lens", "avg_lens", "avg_wrapping",
+                  "sd_wrapping", "wrappings_by_individual", "n_of_decodes", "generation_statistics", "TE", "VAMM",
+                  "PEX", "executor", "n_workers", "chunks_per_worker", "instrumentation", "instrumentation_file",
+                  "checkpoint_file", "checkpoint_interval", "log_file", "log_buffer_size", "log_file_position",
+                  "keep_logs_in_memory")
 
 
 class Parameters:
@@ -25,6 +38,9 @@ class Parameters:
         self.initial_tournament_size = 5
         self.final_tournament_size = 15
 
+        # Variation parameters
+        self.variation_mode = "individual" # individual, batched
+
         # Mating parameters
         self.mating_probability = 0.9
 
@@ -45,6 +61,19 @@ class Parameters:
         # Parameters for fitness value calculation
         self.min_assumable_fitness = 0.1
         self.max_wrapping = 5
+        self.grammar_file = "grammar.bnf" # path of a BNF file (relative paths are relative to the code directory)
+        self.decoding_memo = False
+        self.decoding_memo_size = 20000
+        self.decoding_memo_stride = 4
+        self.evaluation_mode = "scalar" # scalar, vectorized, stack
+        self.population_evaluation = "individual" # individual, dag (needs vectorized or stack, and finite_differences)
+        self.derivative_mode = "finite_differences" # finite_differences, dual
+        self.compiled_phenotypes_cache_size = 10000
+        self.fitness_cache_size = 10000
+        self.simplify_phenotypes = False
+        self.simplified_phenotypes_cache_size = 10000
+        self.bounded_evaluation = False # only used in scalar evaluation mode with finite_differences
+        self.evaluation_block_size = 10
         self.problem = 1
         self.compute_problem_parameters()
 
@@ -74,10 +103,36 @@ class Parameters:
         self.best_individual_factible_times_populationLen = 0
         self.best_individual_factible_integrationConst = 0
 
+        # Parameters of the parallel evaluation
+        self.executor = "serial" # serial, thread, process
+        self.n_workers = os.cpu_count()
+        self.chunks_per_worker = 4
+
+        # Parameters of the instrumentation (time of each phase and counters of each generation)
+        self.instrumentation = False
+        self.instrumentation_file = None # None, path of a .csv or .json file
+        self.generation_statistics = [] # records of the instrumentation (also stored in the checkpoints)
+
+        # Parameters of the island model (see island_model.py)
+        self.n_islands = 1
+        self.migration_interval = 10
+        self.n_migrants = 2
+        self.migration_topology = "ring" # ring, fully_connected, random
+
+        # Parameters of the checkpoints
+        self.checkpoint_file = None # None, path of the checkpoint file
+        self.checkpoint_interval = 10
+
         # Parameters for local search
         self.local_search_prob = 0.9
         self.n_codons_to_modify = 5
 
+        # Parameters of the log file (written generation by generation)
+        self.log_file = None # None, path of a .csv file or of a binary columnar file (any other extension)
+        self.log_buffer_size = 10
+        self.log_file_position = None
+        self.keep_logs_in_memory = True
+
         # Lists to save logs
         self.avg_fitnesses = [0 for _ in range(self.max_gens + 1)]
         self.min_fitnesses = [0 for _ in range(self.max_gens + 1)]
@@ -91,31 +146,99 @@ class Parameters:
         self.sd_wrapping = [0 for _ in range(self.max_gens + 1)]
 
         self.wrappings_by_individual = []
+        self.n_of_decodes = 0
 
         self.compute_N()
 
     def clear_logs(self):
 
         """
-        Function that clear logs for each independent executions
+        Function that clear logs for each independent executions. The log lists are left empty if logs are not kept
+        in memory (see keep_logs_in_memory)
 
         :return:
         """
-        self.avg_fitnesses = [0 for _ in range(self.max_gens+1)]
-        self.min_fitnesses = [0 for _ in range(self.max_gens+1)]
-        self.sd_fitnesses = [0 for _ in range(self.max_gens+1)]
+        n_of_logged_generations = self.max_gens + 1 if self.keep_logs_in_memory else 0
+
+        self.avg_fitnesses = [0 for _ in range(n_of_logged_generations)]
+        self.min_fitnesses = [0 for _ in range(n_of_logged_generations)]
+        self.sd_fitnesses = [0 for _ in range(n_of_logged_generations)]
 
-        self.min_lens = [0 for _ in range(self.max_gens+1)]
-        self.max_lens = [0 for _ in range(self.max_gens+1)]
-        self.avg_lens = [0 for _ in range(self.max_gens+1)]
+        self.min_lens = [0 for _ in range(n_of_logged_generations)]
+        self.max_lens = [0 for _ in range(n_of_logged_generations)]
+        self.avg_lens = [0 for _ in range(n_of_logged_generations)]
 
-        self.avg_wrapping = [0 for _ in range(self.max_gens+1)]
-        self.sd_wrapping = [0 for _ in range(self.max_gens+1)]
+        self.avg_wrapping = [0 for _ in range(n_of_logged_generations)]
+        self.sd_wrapping = [0 for _ in range(n_of_logged_generations)]
 
         self.TE = -1
         self.VAMM = -1
         self.PEX = -1
 
+    def copy_for_evaluation(self):
+
+        """
+        Returns a shallow copy of the parameters without the logs, cheap to send to other processes
+
+        :return: copy of the parameters
+        """
+
+        evaluation_parameters = copy.copy(self)
+
+        evaluation_parameters.avg_fitnesses = []
+        evaluation_parameters.min_fitnesses = []
+        evaluation_parameters.sd_fitnesses = []
+
+        evaluation_parameters.min_lens = []
+        evaluation_parameters.max_lens = []
+        evaluation_parameters.avg_lens = []
+
+        evaluation_parameters.avg_wrapping = []
+        evaluation_parameters.sd_wrapping = []
+
+        evaluation_parameters.wrappings_by_individual = []
+        evaluation_parameters.n_of_decodes = 0
+
+        return evaluation_parameters
+
+    def get_digest(self):
+
+        """
+        Returns a digest of the configuration (every attribute but the ones in RUN_ATTRIBUTES), so runs with different
+        configurations can be told apart (e.g. the checkpoints and the results of the parameter sweeps)
+
+        :return: hexadecimal digest
+        """
+
+        configuration = {name: value for name, value in vars(self).items() if name not in RUN_ATTRIBUTES}
+
+        return hashlib.sha1(json.dumps(configuration, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def check_evaluation_modes(self):
+
+        """
+        Checks that the evaluation modes are valid and can be combined. The evaluation of the population as a DAG (see
+        expression_dag.py) evaluates the expressions over NumPy arrays with finite differences, so it gives the same
+        fitness values as the vectorized and stack modes and can not be used with the other ones
+
+        :return:
+        """
+
+        if self.evaluation_mode not in ("scalar", "vectorized", "stack"):
+            raise ValueError('Invalid evaluation mode: {}'.format(self.evaluation_mode))
+
+        if self.derivative_mode not in ("finite_differences", "dual"):
+            raise ValueError('Invalid derivative mode: {}'.format(self.derivative_mode))
+
+        if self.population_evaluation not in ("individual", "dag"):
+            raise ValueError('Invalid population evaluation: {}'.format(self.population_evaluation))
+
+        if self.population_evaluation == "dag" and (self.evaluation_mode == "scalar"
+                                                    or self.derivative_mode != "finite_differences"):
+            raise ValueError('Invalid evaluation modes: population evaluation "dag" needs evaluation mode "vectorized" '
+                             'or "stack" and derivative mode "finite_differences" (got {}, {})'
+                             .format(self.evaluation_mode, self.derivative_mode))
+
     def compute_N(self):
 
         """
@@ -129,28 +252,14 @@ class Parameters:
 
     def compute_problem_parameters(self):
         """
-        Reads the configuration of the selected problem
+        Reads the interval and the integration constant of the selected problem from the registry of problems
 
         :return:
         """
-        if self.problem == 1:
-            self.interval = (0, 5)
-            self.F_0 = 5
-        elif self.problem == 2:
-            self.interval = (0, 5)
-            self.F_0 = -1
-        elif self.problem == 3:
-            self.interval = (-2, 2)
-            self.F_0 = -0.25
-        elif self.problem == 4:
-            self.interval = (0, 2)
-            self.F_0 = 0.3333333
-        elif self.problem == 5:
-            self.interval = (0, 5)
-            self.F_0 = 0
-        elif self.problem == 6:
-            self.interval = (-2, 2)
-            self.F_0 = 0
+        problem = get_problem(self.problem)
+
+        self.interval = problem.interval
+        self.F_0 = problem.F_0
 
     def compute_mutation_prob(self, generation):
 
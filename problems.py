@@ -0,0 +1,166 @@
+import numpy as np
+from caching import LRUCache
+
+"""
+File that contains the registry of problems. Each problem is the function to integrate (a vectorized callable that
+receives an array of points), the interval where the approximation is evaluated and the integration constant F_0. New
+problems are added with register_problem and selected with parameters.problem
+"""
+
+
+class Problem:
+
+    """
+    Function to integrate together with its interval and its integration constant
+    """
+
+    def __init__(self, function, interval, F_0):
+
+        """
+        :param function: vectorized callable that returns f(x) for an array of points x
+        :param interval: (start, end) of the interval where the approximation is evaluated
+        :param F_0: value of the integral in 0
+        """
+
+        self.function = function
+        self.interval = interval
+        self.F_0 = F_0
+
+
+class TargetSamples:
+
+    """
+    Sample points of a problem and the values of its function to integrate in them. Both arrays are read-only, since
+    they are shared by every evaluation of the run
+    """
+
+    def __init__(self, x, fx):
+
+        """
+        :param x: array with the N+1 sample points
+        :param fx: array with f(x) in each sample point
+        """
+
+        x.flags.writeable = False
+        fx.flags.writeable = False
+
+        self.x = x
+        self.fx = fx
+
+
+problems = {}
+
+# Target samples already computed, by (problem, interval, N)
+target_samples = LRUCache(max_size=64)
+
+# Caches whose entries depend on the registered problems, emptied when a problem is registered (see add_problem_cache)
+problem_caches = [target_samples]
+
+
+def register_problem(problem_id, function, interval, F_0):
+
+    """
+    Adds a problem to the registry (replacing the one with the same id, if any) and empties the caches that depend on
+    the registered problems
+
+    :param problem_id: id of the problem (value of parameters.problem that selects it)
+    :param function: vectorized callable that returns f(x) for an array of points x
+    :param interval: (start, end) of the interval where the approximation is evaluated
+    :param F_0: value of the integral in 0
+
+    :return:
+    """
+
+    problems[problem_id] = Problem(function, interval, F_0)
+
+    for cache in problem_caches:
+        cache.clear()
+
+
+def add_problem_cache(cache):
+
+    """
+    Adds a cache to the ones emptied when a problem is registered. The modules that cache values computed from a
+    problem add their caches here, as this module can not import them (they import it)
+
+    :param cache: cache (see caching.LRUCache)
+
+    :return:
+    """
+
+    problem_caches.append(cache)
+
+
+def get_problem(problem_id):
+
+    """
+    Returns a problem of the registry
+
+    :param problem_id: id of the problem
+
+    :return: problem
+    """
+
+    if problem_id not in problems:
+        raise Exception('Invalid problem: {}'.format(problem_id))
+
+    return problems[problem_id]
+
+
+def get_target_samples(parameters):
+
+    """
+    Returns the sample points of the selected problem and the values of its function to integrate in them. They are
+    computed only once for each problem, interval and N
+
+    :param parameters: parameters of the algorithm
+
+    :return: target samples
+    """
+
+    key = (parameters.problem, tuple(parameters.interval), parameters.N)
+    samples = target_samples.get(key)
+
+    if samples is None:
+        deltaX = (parameters.interval[1] - parameters.interval[0]) / parameters.N
+        x = parameters.interval[0] + np.arange(parameters.N + 1) * deltaX
+
+        with np.errstate(all="ignore"):
+            fx = np.asarray(get_problem(parameters.problem).function(x), dtype=float)
+
+        samples = TargetSamples(x, np.broadcast_to(fx, x.shape).copy())
+        target_samples.put(key, samples)
+
+    return samples
+
+
+def problem_1(x):
+    return 6 * x**2
+
+
+def problem_2(x):
+    return 2 / ((x + 1) ** 2)
+
+
+def problem_3(x):
+    return (3 * x**2 - 2*x + 1)/4
+
+
+def problem_4(x):
+    return (np.exp(2 * x) - np.exp(-6 * x))/3
+
+
+def problem_5(x):
+    return np.log(1 + x) + (x / (1 + x))
+
+
+def problem_6(x):
+    return np.exp(x) * (np.sin(x) + np.cos(x))
+
+
+register_problem(1, problem_1, (0, 5), 5)
+register_problem(2, problem_2, (0, 5), -1)
+register_problem(3, problem_3, (-2, 2), -0.25)
+register_problem(4, problem_4, (0, 2), 0.3333333)
+register_problem(5, problem_5, (0, 5), 0)
+register_problem(6, problem_6, (-2, 2), 0)
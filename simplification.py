@@ -0,0 +1,213 @@
+import ast
+import math
+from caching import LRUCache
+from vectorized_evaluation import VectorizedMath
+
+"""
+File that contains the algebraic simplification of the decoded expressions. Constant subexpressions are folded,
+identities (*1.0, /1.0, +0.0, -0.0) are removed and the operands of commutative operations are sorted, so expressions
+that only differ in that redundant structure get the same canonical form. Every transformation keeps the value of the
+expression bit for bit in every evaluation mode, including the points where it can not be evaluated: subexpressions
+that raise an exception (or give a non finite value) are never folded
+"""
+
+simplified_phenotypes = LRUCache(max_size=10000)
+
+BINARY_FOLDS = {
+    ast.Add: lambda left, right: left + right,
+    ast.Sub: lambda left, right: left - right,
+    ast.Mult: lambda left, right: left * right,
+    ast.Div: lambda left, right: left / right,
+}
+
+CALL_FOLDS = ("sin", "cos", "exp", "log")
+
+
+def get_constant(node):
+
+    """
+    Returns the value of a node if it is a float constant (or the negation of one)
+
+    :param node: node of the syntax tree
+
+    :return: value (None if the node is not a float constant)
+    """
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, float):
+        return node.value
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = get_constant(node.operand)
+
+        if value is not None:
+            return -value
+
+    return None
+
+
+def get_constant_node(value):
+
+    """
+    Returns the node of a float constant. Negative values are written as a negation, so they keep their meaning
+    whatever the precedence of the enclosing operation is
+
+    :param value: value of the constant
+
+    :return: node of the syntax tree
+    """
+
+    if math.copysign(1.0, value) < 0:
+        return ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=-value))
+
+    return ast.Constant(value=value)
+
+
+def fold_binary_operation(operation, left, right):
+
+    """
+    Computes a binary operation between two constants. IEEE operations give the same result with python floats and
+    NumPy arrays, so the result is valid in every evaluation mode
+
+    :param operation: type of the operation (ast.Add, ast.Sub, ast.Mult or ast.Div)
+    :param left: left operand
+    :param right: right operand
+
+    :return: result (None if the operation raises an exception or its result is not finite)
+    """
+
+    try:
+        result = BINARY_FOLDS[operation](left, right)
+    except (ZeroDivisionError, OverflowError):
+        return None
+
+    return result if math.isfinite(result) else None
+
+
+def fold_call(function_name, value):
+
+    """
+    Computes a function of the math module over a constant. The function is folded only if python and NumPy (used by
+    the vectorized evaluations) give the same value, so the result is valid in every evaluation mode
+
+    :param function_name: name of the function (sin, cos, exp or log)
+    :param value: argument
+
+    :return: result (None if the function raises an exception, its result is not finite or it depends on the
+             evaluation mode)
+    """
+
+    try:
+        result = getattr(math, function_name)(value)
+    except (ValueError, OverflowError):
+        return None
+
+    if not math.isfinite(result) or float(getattr(VectorizedMath, function_name)(value)) != result:
+        return None
+
+    return result
+
+
+class Simplifier(ast.NodeTransformer):
+
+    """
+    Simplifies the syntax tree of an expression bottom-up
+    """
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+
+        value = get_constant(node)
+
+        if value is not None:
+            return get_constant_node(value)
+
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+
+        if (isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name)
+                and node.func.value.id == "math" and node.func.attr in CALL_FOLDS and len(node.args) == 1):
+
+            value = get_constant(node.args[0])
+
+            if value is not None:
+                result = fold_call(node.func.attr, value)
+
+                if result is not None:
+                    return get_constant_node(result)
+
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+
+        operation = type(node.op)
+
+        if operation not in BINARY_FOLDS:
+            return node
+
+        left, right = get_constant(node.left), get_constant(node.right)
+
+        if left is not None and right is not None:
+            result = fold_binary_operation(operation, left, right)
+
+            if result is not None:
+                return get_constant_node(result)
+
+        # Identities. They can only change the sign of a zero, which does not change the value of any expression of
+        # the grammar (divisions by zero and logarithms of zero are invalid whatever its sign is)
+        if operation in (ast.Mult, ast.Div) and right == 1.0:
+            return node.left
+        if operation is ast.Mult and left == 1.0:
+            return node.right
+        if operation in (ast.Add, ast.Sub) and right == 0.0:
+            return node.left
+        if operation is ast.Add and left == 0.0:
+            return node.right
+
+        # Canonical order of the operands of commutative operations (IEEE addition and multiplication are commutative)
+        if operation in (ast.Add, ast.Mult) and ast.dump(node.right) < ast.dump(node.left):
+            node.left, node.right = node.right, node.left
+
+        return node
+
+
+def simplify_expression(decoded_function):
+
+    """
+    Returns the canonical form of a decoded expression
+
+    :param decoded_function: decoded expression
+
+    :return: simplified expression
+    """
+
+    tree = Simplifier().visit(ast.parse(decoded_function, mode="eval"))
+    return ast.unparse(ast.fix_missing_locations(tree))
+
+
+def simplify_phenotype(decoded_function, parameters):
+
+    """
+    Returns the simplified expression of a decoded expression if parameters.simplify_phenotypes is set, storing it in
+    a LRU cache keyed by the decoded expression
+
+    :param decoded_function: decoded expression
+    :param parameters: parameters of the algorithm
+
+    :return: expression to evaluate
+    """
+
+    if not parameters.simplify_phenotypes:
+        return decoded_function
+
+    simplified_function = simplified_phenotypes.get(decoded_function)
+
+    if simplified_function is None:
+        simplified_function = simplify_expression(decoded_function)
+
+        simplified_phenotypes.max_size = parameters.simplified_phenotypes_cache_size
+        simplified_phenotypes.put(decoded_function, simplified_function)
+
+    return simplified_function
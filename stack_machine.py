@@ -0,0 +1,156 @@
+import ast
+import numpy as np
+from vectorized_evaluation import protected_division, protected_sin, protected_cos, protected_exp, protected_log
+
+"""
+File that contains the evaluation of decoded expressions as postfix programs of a stack machine. Each expression is
+translated once (post-order traversal of its syntax tree) into a compact program of opcodes and constants, which is
+run with NumPy arrays spanning every sample point as entries of the stack. Invalid points become NaN (see
+vectorized_evaluation.py), so the program never raises an exception
+"""
+
+PUSH_X = 0
+PUSH_CONST = 1
+ADD = 2
+SUB = 3
+MUL = 4
+DIV = 5
+NEG = 6
+SIN = 7
+COS = 8
+EXP = 9
+LOG = 10
+
+BINARY_OPCODES = {ast.Add: ADD, ast.Sub: SUB, ast.Mult: MUL, ast.Div: DIV}
+
+CALL_OPCODES = {"sin": SIN, "cos": COS, "exp": EXP, "log": LOG}
+
+# Operators and functions of the grammar terminals that can be translated into opcodes (- is also the unary minus)
+SUPPORTED_OPERATORS = {"+", "-", "*", "/", *CALL_OPCODES}
+
+# Operation and number of operands of each opcode
+OPERATIONS = {
+    ADD: (np.add, 2),
+    SUB: (np.subtract, 2),
+    MUL: (np.multiply, 2),
+    DIV: (protected_division, 2),
+    NEG: (np.negative, 1),
+    SIN: (protected_sin, 1),
+    COS: (protected_cos, 1),
+    EXP: (protected_exp, 1),
+    LOG: (protected_log, 1),
+}
+
+
+class Program:
+
+    """
+    Postfix program of the stack machine: opcodes (one byte each) and the constants pushed by the PUSH_CONST opcodes,
+    in the order they are used. Programs are functions of x, like the compiled expressions
+    """
+
+    def __init__(self, opcodes, constants):
+
+        """
+        :param opcodes: bytes with the opcodes of the program
+        :param constants: tuple with the constants of the program
+        """
+
+        self.opcodes = opcodes
+        self.constants = constants
+
+    def __call__(self, x):
+        return run_program(self, x)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+
+def compile_program(decoded_function):
+
+    """
+    Translates a decoded expression into a postfix program
+
+    :param decoded_function: decoded expression
+
+    :return: program
+    """
+
+    opcodes = bytearray()
+    constants = []
+
+    add_ast_node(ast.parse(decoded_function, mode="eval").body, opcodes, constants)
+
+    return Program(bytes(opcodes), tuple(constants))
+
+
+def add_ast_node(node, opcodes, constants):
+
+    """
+    Appends the opcodes of a node of the syntax tree of an expression (after the opcodes of its children)
+
+    :param node: node of the syntax tree
+    :param opcodes: opcodes of the program being compiled
+    :param constants: constants of the program being compiled
+
+    :return:
+    """
+
+    if isinstance(node, ast.Name):
+        opcodes.append(PUSH_X)
+
+    elif isinstance(node, ast.Constant):
+        opcodes.append(PUSH_CONST)
+        constants.append(float(node.value))
+
+    elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPCODES:
+        add_ast_node(node.left, opcodes, constants)
+        add_ast_node(node.right, opcodes, constants)
+        opcodes.append(BINARY_OPCODES[type(node.op)])
+
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        add_ast_node(node.operand, opcodes, constants)
+        opcodes.append(NEG)
+
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in CALL_OPCODES:
+        add_ast_node(node.args[0], opcodes, constants)
+        opcodes.append(CALL_OPCODES[node.func.attr])
+
+    else:
+        raise Exception('Trying to evaluate an invalid expression: {}'.format(ast.unparse(node)))
+
+
+def run_program(program, x):
+
+    """
+    Runs a postfix program over an array of sample points
+
+    :param program: program (see compile_program)
+    :param x: sample points
+
+    :return: value of the expression on each sample point (NaN where it is not defined). A constant expression
+             returns a single value
+    """
+
+    stack = []
+    constants = iter(program.constants)
+
+    with np.errstate(all="ignore"):
+        for opcode in program.opcodes:
+
+            if opcode == PUSH_X:
+                stack.append(x)
+
+            elif opcode == PUSH_CONST:
+                stack.append(next(constants))
+
+            else:
+                operation, n_of_operands = OPERATIONS[opcode]
+
+                if n_of_operands == 2:
+                    right = stack.pop()
+                    stack[-1] = operation(stack[-1], right)
+                else:
+                    stack[-1] = operation(stack[-1])
+
+    return stack[-1]
@@ -0,0 +1,378 @@
+import copy
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from main import run_independent_execution, get_execution_seeds
+from parameters import Parameters
+from log_writer import read_log
+
+"""
+File that runs parameter sweeps: every configuration of a grid or random design over the fields of Parameters is run
+with several seeds in a pool of processes. The result of each (configuration, seed) job is appended to a result
+store (a JSON lines file) as soon as it finishes, so a sweep that is restarted skips the jobs already done. The curves
+of each job are read from its log file (stored in a directory next to the result store), so they are available with
+the island model and when the logs are not kept in memory
+"""
+
+# Curves of the executions stored with each result, and the column of the log file (see log_writer.py) they come from
+CURVES = {
+    "avg_fitnesses": "avg_fitness",
+    "min_fitnesses": "min_fitness",
+    "sd_fitnesses": "std_fitness",
+    "min_lens": "min_genotype_len",
+    "max_lens": "max_genotype_len",
+    "avg_lens": "avg_genotype_len",
+    "avg_wrapping": "avg_wrapping",
+    "sd_wrapping": "std_wrapping",
+}
+
+
+def get_grid_design(grid):
+
+    """
+    Returns every combination of the values of a grid
+
+    :param grid: dictionary field of Parameters -> list of values
+
+    :return: list of configurations (dictionaries field -> value)
+    """
+
+    fields = list(grid)
+    return [dict(zip(fields, values)) for values in itertools.product(*[grid[field] for field in fields])]
+
+
+def get_random_design(space, n_of_configurations, random_seed):
+
+    """
+    Returns configurations sampled at random from a space of values
+
+    :param space: dictionary field of Parameters -> list of values (one of them is chosen) or (low, high) tuple (a
+                  float is sampled uniformly, or an int if both limits are ints)
+    :param n_of_configurations: number of configurations
+    :param random_seed: seed of the sampling
+
+    :return: list of configurations (dictionaries field -> value)
+    """
+
+    rng = np.random.default_rng(random_seed)
+    configurations = []
+
+    for _ in range(n_of_configurations):
+        configuration = {}
+
+        for field, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+
+                if isinstance(low, int) and isinstance(high, int):
+                    configuration[field] = int(rng.integers(low, high + 1))
+                else:
+                    configuration[field] = float(rng.uniform(low, high))
+
+            else:
+                configuration[field] = values[int(rng.integers(len(values)))]
+
+        configurations.append(configuration)
+
+    return configurations
+
+
+def get_parameters(configuration, base_parameters=None):
+
+    """
+    Returns the parameters of a configuration, recomputing the values derived from the changed fields
+
+    :param configuration: dictionary field of Parameters -> value
+    :param base_parameters: parameters the configuration is applied to (default ones if None)
+
+    :return: parameters
+    """
+
+    parameters = Parameters() if base_parameters is None else copy.deepcopy(base_parameters)
+
+    for field, value in configuration.items():
+        if not hasattr(parameters, field):
+            raise Exception('Invalid parameter: {}'.format(field))
+
+        setattr(parameters, field, value)
+
+    if parameters.population_length % 2 != 0:
+        parameters.population_length += 1
+
+    if "problem" in configuration:
+        parameters.compute_problem_parameters()
+
+    parameters.compute_N()
+    parameters.clear_logs()
+
+    return parameters
+
+
+def get_base_digest(base_parameters):
+
+    """
+    Returns the digest of the parameters the configurations of a sweep are applied to, so that the jobs of sweeps
+    with different base parameters get different keys
+
+    :param base_parameters: parameters the configurations are applied to (default ones if None)
+
+    :return: digest (see Parameters.get_digest)
+    """
+
+    return (Parameters() if base_parameters is None else base_parameters).get_digest()
+
+
+def get_job_key(configuration, seed, base_digest):
+
+    """
+    Returns the key that identifies a job in the result store
+
+    :param configuration: configuration of the job
+    :param seed: seed of the job
+    :param base_digest: digest of the base parameters of the job (see get_base_digest)
+
+    :return: key
+    """
+
+    return json.dumps({"configuration": configuration, "seed": seed, "base_parameters": base_digest}, sort_keys=True)
+
+
+def get_log_directory(store_file):
+
+    """
+    Returns the directory where the log files of the jobs of a result store are written
+
+    :param store_file: path of the result store
+
+    :return: path of the directory
+    """
+
+    return os.path.splitext(store_file)[0] + "_logs"
+
+
+def get_job_log_file(log_directory, configuration, seed, base_digest):
+
+    """
+    Returns the path of the log file of a job, named after the hash of its key
+
+    :param log_directory: directory of the logs of the jobs
+    :param configuration: configuration of the job
+    :param seed: seed of the job
+    :param base_digest: digest of the base parameters of the job (see get_base_digest)
+
+    :return: path of the log file
+    """
+
+    job_key = get_job_key(configuration, seed, base_digest)
+
+    return os.path.join(log_directory, hashlib.sha1(job_key.encode()).hexdigest() + ".csv")
+
+
+def run_job(configuration, seed, log_file, base_parameters=None):
+
+    """
+    Runs a (configuration, seed) job, writing its log to log_file
+
+    :param configuration: configuration of the job
+    :param seed: seed of the job
+    :param log_file: path of the log file of the job
+    :param base_parameters: parameters the configuration is applied to (default ones if None)
+
+    :return: result of the job (dictionary that is stored in the result store)
+    """
+
+    parameters = get_parameters(configuration, base_parameters)
+    _, success, best_individuals_fitness_value, number_of_evaluations = run_independent_execution(parameters, seed,
+                                                                                                  log_file=log_file)
+
+    log = read_log(log_file)
+
+    return {
+        "key": get_job_key(configuration, seed, get_base_digest(base_parameters)),
+        "configuration": configuration,
+        "seed": seed,
+        "success": success,
+        "best_fitness": best_individuals_fitness_value,
+        "n_of_evaluations": number_of_evaluations,
+        "curves": {curve: log[column].tolist() if column in log else [] for curve, column in CURVES.items()},
+    }
+
+
+def read_results(store_file):
+
+    """
+    Reads the results of a result store. A line cut by an interrupted write is ignored
+
+    :param store_file: path of the result store
+
+    :return: list of results (see run_job)
+    """
+
+    if not os.path.exists(store_file):
+        return []
+
+    results = []
+
+    with open(store_file) as file:
+        for line in file:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+
+    return results
+
+
+def append_result(store_file, result):
+
+    """
+    Appends the result of a job to the result store, forcing it to disk
+
+    :param store_file: path of the result store
+    :param result: result of a job (see run_job)
+
+    :return:
+    """
+
+    with open(store_file, "a") as file:
+        file.write(json.dumps(result) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def repair_store(store_file, results):
+
+    """
+    Rewrites the result store with its complete results if its last line was cut by an interrupted write, so new
+    results are not appended to it
+
+    :param store_file: path of the result store
+    :param results: complete results of the store (see read_results)
+
+    :return:
+    """
+
+    if not os.path.exists(store_file):
+        return
+
+    with open(store_file) as file:
+        n_of_lines = sum(1 for _ in file)
+
+    if n_of_lines != len(results):
+        with open(store_file + ".tmp", "w") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+
+        os.replace(store_file + ".tmp", store_file)
+
+
+def run_sweep(configurations, n_of_executions, store_file, n_of_workers, random_seed, base_parameters=None):
+
+    """
+    Runs n_of_executions executions of each configuration in a pool of processes, skipping the jobs already stored in
+    the result store. The seeds of the executions are the same for every configuration (see get_execution_seeds), and
+    the log of each job is written to the directory returned by get_log_directory
+
+    :param configurations: configurations of the sweep (see get_grid_design and get_random_design)
+    :param n_of_executions: number of independent executions of each configuration
+    :param store_file: path of the result store
+    :param n_of_workers: number of jobs run at the same time
+    :param random_seed: seed of the sweep
+    :param base_parameters: parameters the configurations are applied to (default ones if None)
+
+    :return: list with the results of every job of the sweep
+    """
+
+    results = read_results(store_file)
+    repair_store(store_file, results)
+
+    log_directory = get_log_directory(store_file)
+    os.makedirs(log_directory, exist_ok=True)
+
+    done_keys = {result["key"] for result in results}
+    base_digest = get_base_digest(base_parameters)
+    seeds = get_execution_seeds(random_seed, n_of_executions)
+
+    jobs = [(configuration, seed) for configuration in configurations for seed in seeds
+            if get_job_key(configuration, seed, base_digest) not in done_keys]
+
+    print(f"{len(jobs)} jobs to run ({len(done_keys)} already done)")
+
+    with ProcessPoolExecutor(max_workers=n_of_workers) as executor:
+        futures = [executor.submit(run_job, configuration, seed,
+                                   get_job_log_file(log_directory, configuration, seed, base_digest), base_parameters)
+                   for configuration, seed in jobs]
+
+        for n_of_finished_jobs, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            append_result(store_file, result)
+            results.append(result)
+
+            print(f"Job {n_of_finished_jobs}/{len(jobs)} finished: {result['key']}")
+
+    sweep_keys = {get_job_key(configuration, seed, base_digest) for configuration in configurations for seed in seeds}
+
+    return [result for result in results if result["key"] in sweep_keys]
+
+
+def summarize_results(results):
+
+    """
+    Computes TE, VAMM and PEX (see main.py) of each configuration
+
+    :param results: results of the jobs (see run_job)
+
+    :return: list of (configuration, TE, VAMM, PEX)
+    """
+
+    results_by_configuration = {}
+
+    for result in results:
+        configuration_key = json.dumps(result["configuration"], sort_keys=True)
+        results_by_configuration.setdefault(configuration_key, []).append(result)
+
+    summary = []
+
+    for configuration_key, configuration_results in results_by_configuration.items():
+        n_of_evaluations = [result["n_of_evaluations"] for result in configuration_results if result["success"]]
+
+        TE = 100.0 * len(n_of_evaluations) / len(configuration_results)
+        VAMM = float(np.mean([result["best_fitness"] for result in configuration_results]))
+        PEX = float(np.mean(n_of_evaluations)) if len(n_of_evaluations) > 0 else -1
+
+        summary.append((json.loads(configuration_key), TE, VAMM, PEX))
+
+    return summary
+
+
+def main():
+
+    STORE_FILE = "../log/sweep_results.jsonl"
+    RANDOM_SEED = 42
+    N_OF_INDEPENDENT_EXECUTIONS = 30
+    N_OF_WORKERS = os.cpu_count()
+
+    GRID = {
+        "problem": [1, 2, 3, 4, 5, 6],
+        "survival_selection_method": ["mu_plus_lambda", "steady_state_model"],
+        "local_search_prob": [0.5, 0.9],
+    }
+
+    os.makedirs(os.path.dirname(STORE_FILE), exist_ok=True)
+
+    results = run_sweep(get_grid_design(GRID), N_OF_INDEPENDENT_EXECUTIONS, STORE_FILE, N_OF_WORKERS, RANDOM_SEED)
+
+    print("configuration\tTE\tVAMM\tPEX")
+    print("-------------------------------------------------------------")
+    for configuration, TE, VAMM, PEX in summarize_results(results):
+        print(f"{configuration}\t{TE}\t{VAMM}\t{PEX}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        exit()
@@ -0,0 +1,161 @@
+import ast
+import numpy as np
+
+"""
+File that contains the evaluation of decoded expressions over a whole NumPy array of sample points. The operations
+that raise an exception when evaluated point by point with python (division by zero, domain errors of math.log,
+overflow of math.exp) produce NaN instead, so invalid points become a mask instead of an exception
+"""
+
+
+def protected_division(numerator, denominator):
+
+    """
+    Division that returns NaN where the denominator is zero (ZeroDivisionError in python)
+
+    :param numerator: numerator
+    :param denominator: denominator
+
+    :return: numerator / denominator
+    """
+
+    with np.errstate(all="ignore"):
+        return np.where(denominator == 0, np.nan, np.divide(numerator, denominator))
+
+
+def protected_sin(value):
+
+    """
+    Sine that returns NaN for infinite values (ValueError in python)
+
+    :param value: argument
+
+    :return: sin(value)
+    """
+
+    with np.errstate(all="ignore"):
+        return np.sin(value)
+
+
+def protected_cos(value):
+
+    """
+    Cosine that returns NaN for infinite values (ValueError in python)
+
+    :param value: argument
+
+    :return: cos(value)
+    """
+
+    with np.errstate(all="ignore"):
+        return np.cos(value)
+
+
+def protected_exp(value):
+
+    """
+    Exponential that returns NaN where a finite argument overflows (OverflowError in python)
+
+    :param value: argument
+
+    :return: exp(value)
+    """
+
+    with np.errstate(all="ignore"):
+        result = np.exp(value)
+        return np.where(np.isinf(result) & np.isfinite(value), np.nan, result)
+
+
+def protected_log(value):
+
+    """
+    Logarithm that returns NaN for non positive values (ValueError in python)
+
+    :param value: argument
+
+    :return: log(value)
+    """
+
+    with np.errstate(all="ignore"):
+        return np.where(value > 0, np.log(value), np.nan)
+
+
+class VectorizedMath:
+
+    """
+    Replacement of the math module used by the decoded expressions
+    """
+
+    sin = staticmethod(protected_sin)
+    cos = staticmethod(protected_cos)
+    exp = staticmethod(protected_exp)
+    log = staticmethod(protected_log)
+
+
+# Operators and functions of the grammar terminals that the compiled expressions support
+SUPPORTED_OPERATORS = {"+", "-", "*", "/", "**", "//", "%", "sin", "cos", "exp", "log"}
+
+
+class ProtectDivision(ast.NodeTransformer):
+
+    """
+    Replaces each division of the expression with a call to protected_division
+    """
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+
+        if isinstance(node.op, ast.Div):
+            return ast.copy_location(ast.Call(func=ast.Name(id="protected_division", ctx=ast.Load()),
+                                              args=[node.left, node.right], keywords=[]), node)
+
+        return node
+
+
+def compile_vectorized_expression(decoded_function, math_module=VectorizedMath, division=protected_division):
+
+    """
+    Compiles a decoded expression into a function of x that works over NumPy arrays
+
+    :param decoded_function: decoded expression
+    :param math_module: object that replaces the math module in the expression
+    :param division: function that replaces the divisions of the expression
+
+    :return: function of x
+    """
+
+    tree = ast.parse(f"lambda x: {decoded_function}", mode="eval")
+    tree = ast.fix_missing_locations(ProtectDivision().visit(tree))
+
+    namespace = {"math": math_module, "protected_division": division, "__builtins__": {}}
+    return eval(compile(tree, "<decoded_function>", "eval"), namespace)
+
+
+def evaluate_on_samples(function, x):
+
+    """
+    Evaluates a compiled expression over an array of sample points
+
+    :param function: compiled expression (see compile_vectorized_expression)
+    :param x: sample points
+
+    :return: array with the value of the expression on each sample point (NaN where it is not defined)
+    """
+
+    with np.errstate(all="ignore"):
+        values = function(x)
+
+    return np.broadcast_to(np.asarray(values, dtype=float), np.shape(x))
+
+
+def get_invalid_mask(values):
+
+    """
+    Returns the mask of the sample points where the expression can not be used to approximate the integral
+
+    :param values: values of the expression (see evaluate_on_samples)
+
+    :return: boolean mask
+    """
+
+    return ~np.isfinite(values)